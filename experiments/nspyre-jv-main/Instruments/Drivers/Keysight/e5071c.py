@@ -16,9 +16,27 @@ Eric Rosenthal, 2022-08-25
 """
 
 import pyvisa as visa
-import time
 import numpy as np
-from tqdm import tqdm_notebook
+import re
+
+# Settings mirrored in the driver-side cache (commands normalized by
+# E5071C._cache_key). Writes of an unchanged value are skipped and
+# queries are answered from the cache. After a numeric write the value
+# is read back, since the VNA rounds or clamps it (e.g. IF bandwidth).
+CACHED_SETTINGS = re.compile(r'(SOUR:POW:LEV:IMM:AMPL|SENS:AVER:COUN|SENS:AVER:STAT|'
+                             r'SENS:FREQ:STAR|SENS:FREQ:STOP|SENS:SWE:POIN|SENS:BAND:RES|'
+                             r'SENS:CORR:STAT|CALC:PAR:COUN|CALC:PAR\d+:DEF|CALC:SEL:FORM@\d+|'
+                             r'CALC:TRAC\d+:CORR:EDEL:TIME|OUTP|STAT:OPER:PTR|STAT:OPER:NTR|'
+                             r'STAT:OPER:ENAB|\*SRE)$')
+
+# Writing these changes other settings, whose cache entries are dropped
+SWEEP_SETTINGS = ('SENS:FREQ:STAR', 'SENS:FREQ:STOP', 'SENS:SWE:POIN',
+                  'SENS:BAND:RES', 'SOUR:POW:LEV:IMM:AMPL')
+INVALIDATES = {'SENS:FREQ:CENT': ('SENS:FREQ:STAR', 'SENS:FREQ:STOP'),
+               'SENS:FREQ:SPAN': ('SENS:FREQ:STAR', 'SENS:FREQ:STOP'),
+               'SENS:SWE:TYPE': SWEEP_SETTINGS,
+               'SENSE:SWEEP:TYPE': SWEEP_SETTINGS,
+               'SENS:SEGM:DATA': SWEEP_SETTINGS}
 
 class E5071C():
 
@@ -37,17 +55,114 @@ class E5071C():
         else:
             self._inst.timeout = 60000   # Set to a minute
 
+        # Transfer trace data as 64 bit binary (FORM:DATA REAL) instead of
+        # ASCII, binary=False goes back to ASCII transfers
+        self.binary = kwargs.get('binary', True)
+        self._data_format = None   # format last set on the instrument
+
+        # End of sweep is signalled with *OPC? (default), or with a
+        # service request if srq=True
+        self.srq = kwargs.get('srq', False)
+
+        # Cache of the instrument settings, so that only the parameters
+        # that change are sent. cache=False always talks to the VNA.
+        self.cache = kwargs.get('cache', True)
+        self._settings = {}
+        self._requested = {}   # numeric values last written, if the VNA applied another one
+        self._selected_trace = None
+
+    @staticmethod
+    def _cache_value(value):
+        """Normalize a value written or queried, for comparison"""
+        if isinstance(value, str):
+            value = value.strip().upper()
+            value = {'ON': '1', 'OFF': '0'}.get(value, value)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+
+    def _cache_key(self, command):
+        """Normalized command, channel 1 written the short way"""
+        key = command.strip().upper().lstrip(':')
+        for (long, short) in (('SENS1:', 'SENS:'), ('SOUR1:', 'SOUR:'), ('CALC1:', 'CALC:')):
+            if key.startswith(long):
+                key = short + key[len(long):]
+        if key == 'CALC:SEL:FORM':
+            # The format belongs to the selected trace, trace 1 if none
+            # was selected through the driver
+            key += '@{}'.format(self._selected_trace or 1)
+        return key
+
+    def _update_cache(self, key, value):
+        """Record a value written to the VNA, and drop the settings it affects"""
+        if key in ('*RST', 'SYST:PRES'):
+            self.invalidate()
+            return
+        for k in INVALIDATES.get(key, ()):
+            self._settings.pop(k, None)
+        if not CACHED_SETTINGS.match(key):
+            return
+        value = self._cache_value(value)
+        if key == 'CALC:PAR:COUN':
+            # Trace definitions may change with the number of traces
+            for k in [k for k in self._settings if k.startswith(('CALC:PAR', 'CALC:SEL', 'CALC:TRAC'))]:
+                del self._settings[k]
+            if value == 1:
+                self._selected_trace = 1
+        # Start beyond stop (or stop before start) moves the other one
+        other = {'SENS:FREQ:STAR': 'SENS:FREQ:STOP', 'SENS:FREQ:STOP': 'SENS:FREQ:STAR'}.get(key)
+        if other in self._settings:
+            (start, stop) = (value, self._settings[other])
+            if key == 'SENS:FREQ:STOP':
+                (start, stop) = (stop, value)
+            if start >= stop:
+                del self._settings[other]
+        self._settings[key] = value
+
+    def invalidate(self):
+        """Forget the cached settings, e.g. after changes on the front panel"""
+        self._settings = {}
+        self._requested = {}
+        self._selected_trace = None
+        self._data_format = None
+
+    def sync(self):
+        """Re-read the settings from the VNA into the cache
+
+        Returns
+        --------
+        dict
+            Settings as returned by read_settings
+        """
+        self.invalidate()
+        return self.read_settings()
+
     def com(self, command, arg="?"):
         """Function to communicate with the device. Gives the current status
-        if no arg is given"""
+        if no arg is given, as a float if numeric, else as the stripped
+        upper-case string (ON/OFF as 1.0/0.0), cached or not"""
+        key = self._cache_key(command)
         if arg == "?":
-            resp =  self._inst.query("{}?".format(command))
-            try:
-                return float(resp)
-            except:
-                return resp
+            if self.cache and key in self._settings:
+                return self._settings[key]
+            resp = self._cache_value(self._inst.query("{}?".format(command)))
+            if self.cache and CACHED_SETTINGS.match(key):
+                self._settings[key] = resp
+                self._requested.pop(key, None)
+            return resp
         else:
+            value = self._cache_value(arg)
+            if (self.cache and key in self._settings and
+                    value in (self._settings[key], self._requested.get(key))):
+                return 0
             self._inst.write("{} {}".format(command, arg))
+            self._update_cache(key, arg)
+            if self.cache and isinstance(self._settings.get(key), float):
+                # Cache the value the VNA applied, not the one requested
+                applied = self._cache_value(self._inst.query("{}?".format(command)))
+                self._settings[key] = applied
+                self._requested[key] = value
             return 0
 
     def identify(self):
@@ -129,7 +244,7 @@ class E5071C():
            (Par == 'S22')):
             self.com('CALC1:PAR{}:DEF'.format(trace), Par)
         elif Par == '?':
-            return self.com('CALC1:PAR'+str(np.int(trace))+':DEF')
+            return self.com('CALC1:PAR'+str(int(trace))+':DEF')
         else:
             print('No valid Par inserted')
             raise Exception('PAREXC')
@@ -142,6 +257,8 @@ class E5071C():
     def trace_select(self, num=1, channel='1'):
         """Select trace number num"""
         self.com('CALC{}:PAR{}:SEL'.format(channel, num),'')
+        if str(channel) == '1':
+            self._selected_trace = int(num)
 
     def Format(self, Format='?', Trace=1):
         """Set Data Format
@@ -162,20 +279,104 @@ class E5071C():
         com_str = 'CALC1:SEL:FORM'
         return self.com(com_str, Format)
 
+    def data_format(self, fmt='?'):
+        """Set/query the format of trace data transfers
+
+        Parameters
+        -----------
+        fmt : str
+            'ASC' for ASCII, 'REAL' for 64 bit binary. Binary data is
+            sent little endian (FORM:BORD SWAP), so it is read without
+            byte swapping.
+        """
+        if fmt == '?':
+            return self.com(':FORM:DATA')
+        fmt = fmt.upper()
+        if fmt != self._data_format:
+            self.com(':FORM:DATA', fmt)
+            if fmt != 'ASC':
+                self.com(':FORM:BORD', 'SWAP')
+            self._data_format = fmt
+
+    def _read_data(self, com_str):
+        """Query a data array as float64 numpy array"""
+        if self.binary:
+            self.data_format('REAL')
+            return self._inst.query_binary_values(com_str + '?', datatype='d',
+                                                  is_big_endian=False,
+                                                  container=np.ndarray)
+        self.data_format('ASC')
+        return np.asarray(self._inst.query(com_str + '?').split(','), dtype=float)
+
+    def trigger_single(self):
+        """Start a single sweep (all averages), wait for its end with
+        wait_sweep. With self.srq the service request event is enabled
+        before the trigger, so that it can't be missed."""
+        if self.srq:
+            self._inst.enable_event(visa.constants.EventType.service_request,
+                                    visa.constants.EventMechanism.queue)
+        self.com(':TRIG:SEQ:SINGLE','')
+
+    def wait_sweep(self, navg=1):
+        """Wait for the end of a sweep started with trigger_single
+
+        The VNA signals the end of the sweep (including all averages)
+        itself, so this returns as soon as the data is ready. With
+        self.srq the wait is on the service request event (set up by the
+        status registers in meas() and enabled by trigger_single, works
+        on TCPIP::INSTR resources too), otherwise on the reply to *OPC?.
+        The VISA timeout is extended to cover the expected sweep time.
+
+        Parameters
+        -----------
+        navg : int
+            Number of averages of the sweep
+        """
+        sweep_time = self.com("SENS:SWE:TIME")
+        expected = 1e3 * sweep_time * max(navg, 1)   # in ms
+        timeout = self._inst.timeout
+        wait_timeout = max(timeout, 2 * expected + 10000)
+        if self.srq:
+            event_type = visa.constants.EventType.service_request
+            try:
+                self._inst.wait_on_event(event_type, int(wait_timeout))
+                self._inst.read_stb()   # clears the request
+            finally:
+                self._inst.disable_event(event_type, visa.constants.EventMechanism.queue)
+                self._inst.discard_events(event_type, visa.constants.EventMechanism.queue)
+            return
+        self._inst.timeout = wait_timeout
+        try:
+            self._inst.query('*OPC?')
+        finally:
+            self._inst.timeout = timeout
+
     # READING data
     def freq_read(self):
+        """Frequencies (Hz) of the points of the active trace"""
         com_str = 'CALC:TRAC:DATA:XAXis'
-        return self.com(com_str).split(',')
+        return self._read_data(com_str)
 
     def trace_read(self, trace=''):
+        """Formatted data of a trace, as primary and secondary values"""
         com_str = 'CALC:TRACe{}:DATA:FDATa'.format(trace)
-        dat = self.com(com_str).split(',')
+        dat = self._read_data(com_str)
         return dat[0::2], dat[1::2]
 
+    def trace_read_complex(self, trace=''):
+        """Corrected complex data of a trace (S-parameter), as complex128
+
+        The real and imaginary parts are interleaved in the transfer, so
+        the float64 array is viewed as complex without a copy.
+        """
+        com_str = 'CALC:TRACe{}:DATA:SDATa'.format(trace)
+        return self._read_data(com_str).view(np.complex128)
+
     def read_settings(self):
         """Returns current state of VNA parameters as dict
 
-        Frequency in GHz.
+        Frequency in GHz. Parameters already in the settings cache are
+        not queried again, use sync() to read them all from the VNA.
         """
         freq_start = self.freq_start()
         freq_stop = self.freq_stop()
@@ -301,16 +502,11 @@ class E5071C():
         self.com('*CLS','')  # Clear status byte
         # Start measurement
         self.output(1)
-        self.com(':TRIG:SEQ:SINGLE','')
+        self.trigger_single()
         # Wait for averaging
-        sweep_time = self.com("SENS:SWE:TIME")
-        if navg > 1:
-            for i in tqdm_notebook(range(navg), unit="Sweep"):
-                time.sleep(sweep_time)
-        while int(self.com('*STB')) != 192:
-            time.sleep(0.5)
-        x = np.asarray(self.freq_read(), dtype='float')/1e9
-        y = np.asarray(self.trace_read()[0], dtype='float')
+        self.wait_sweep(navg)
+        x = self.freq_read()/1e9
+        y = self.trace_read()[0]
 
         # Reset Device
         # Switch off power and return VNA to initial settings
@@ -327,7 +523,7 @@ class E5071C():
 
     def meas_complex(self, f_range, npoints=1601, navg=1, power=-50,
                      Spar='S21', BW=1e3, power_port2=False,
-                     scale="lin"):
+                     scale="lin", return_complex=False):
         """Measure and save as complex voltage data format.
 
         Parameters
@@ -344,11 +540,16 @@ class E5071C():
             S Parameter to measure. E.g. 'S21'
         BW : int
             IF Bandwidth in Hz
+        return_complex : bool
+            Return the data as a single complex128 array
 
         Returns
         --------
         np.array, np.array, np.array
             Frequencies (GHz), Real part of V, Imaginary part of V
+        or, with return_complex=True
+        np.array, np.array
+            Frequencies (GHz), complex V
         """
         # Check calibration and put error if HEMTs are in danger
         cal_type = self._inst.query(":SENS1:CORR:TYPE?").split(",")
@@ -404,20 +605,15 @@ class E5071C():
             self.com("sense:sweep:type", "lin")
 
         # Start VNA measurement
-        self.com(':TRIG:SEQ:SINGLE','')
+        self.trigger_single()
 
         # Wait for device
-        sweep_time = self.com("SENS:SWE:TIME")
-        if navg > 1:
-            for i in tqdm_notebook(range(navg), unit="Sweep", leave=False):
-                time.sleep(sweep_time)
-        while int(self.com('*STB')) != 192:
-            time.sleep(0.5)
+        self.wait_sweep(navg)
 
         # Acquire data
-        x = np.asarray(self.freq_read(), dtype=float)/1e9
-        re = np.asarray(self.trace_read(1)[0], dtype=np.float)
-        im = np.asarray(self.trace_read(2)[0], dtype=np.float)
+        x = self.freq_read()/1e9
+        re = self.trace_read(1)[0]
+        im = self.trace_read(2)[0]
 
         # Switch off power and return VNA to initial settings
         self.output(0)
@@ -429,10 +625,88 @@ class E5071C():
         self.com(':TRIG:AVER', 'OFF')
         self.com(':TRIG:SEQ:SOUR', 'INT')
 
+        if return_complex:
+            return x, re + 1j*im
         return x, re, im
 
+    def setup_sweep(self, f_range, npoints=1601, navg=1, power=-50,
+                    Spar='S21', BW=1e3, power_port2=False):
+        """Configure a single trace, bus triggered sweep
+
+        For repeated sweeps with the same settings, e.g. while stepping
+        an external parameter: setup_sweep once, then for each trace
+        start_sweep, wait_sweep and trace_read_complex, and end_sweep
+        at the end.
+
+        Parameters
+        -----------
+        f_range : array
+            Frequency range [[f_start, f_stop]] in GHz
+        npoints : int
+            Number of Points
+        navg : int
+            Number of averages
+        power : float
+            VNA output power in dBm
+        Spar : str
+            S Parameter to measure. E.g. 'S21'
+        BW : int
+            IF Bandwidth in Hz
+
+        Returns
+        --------
+        dict
+            Settings of the VNA before the setup (read_settings)
+        """
+        # Check calibration and put error if HEMTs are in danger
+        cal_type = self._inst.query(":SENS1:CORR:TYPE?").split(",")
+        if cal_type[0] == "SOLT2" and not power_port2:
+            raise Exception("Excitation on Port2. Careful with HEMTS! " +
+                            "If you want to measure S22 and S12 set " +
+                            "power_port2=True. Else use Enhanced " +
+                            "Calibration of VNA.")
+        # Save currents pars
+        VNA_pars = self.read_settings()
+        # Set parameters
+        self.IFBW(BW)
+        self.freq_npoints(npoints)
+        self.freq_start(f_range[0]*1e9)
+        self.freq_stop(f_range[1]*1e9)
+        self.power(power)
+        self.traces_number(1)
+        self.trace_select(1)
+        self.Spar(Spar)
+        if navg == 0:
+            self.average_state(0)
+        else:
+            self.average_state(1)
+            self.average_count(navg)
+            self.com(':TRIG:SEQ:AVER', 'ON')
+        self.com(':TRIG:SEQ:SOUR', 'BUS')
+        self.com('INIT:CONT', 'OFF')
+        self.com('INIT:CONT', 'ON')
+        self.com(':STAT:OPER:PTR', '0')
+        self.com(':STAT:OPER:NTR', '16')
+        self.com(':STAT:OPER:ENAB', '16')
+        self.com('*SRE', '128')
+        self.output(1)
+        return VNA_pars
+
+    def start_sweep(self):
+        """Trigger a sweep (all averages) configured with setup_sweep"""
+        self.average_reset()
+        self.com('*CLS','')
+        self.trigger_single()
+
+    def end_sweep(self):
+        """Switch off power and return the trigger to internal"""
+        self.output(0)
+        self.com('*CLS','')
+        self.com(':TRIG:AVER', 'OFF')
+        self.com(':TRIG:SEQ:SOUR', 'INT')
+
     def meas_complex_segm(self, segments, navg=100, power=-50, Spar='S21',
-                          BW=1e3):
+                          BW=1e3, return_complex=False):
         """VNA measurement with segments in complex data format.
 
         If optional entries in segment dictionary are not given it will take
@@ -454,6 +728,9 @@ class E5071C():
             IF bandwidth
         Spar : str
             S Parameter to measure. 'S21' default
+        return_complex : bool
+            Return frequencies (GHz) and complex V instead of real and
+            imaginary parts
         """
         # Save currents pars
         VNA_pars = self.read_settings()
@@ -474,6 +751,8 @@ class E5071C():
             segment_str += tmp
 
         self.com(':SENS:SWE:TYPE', 'SEGM')
+        # The segment table is sent as ASCII, FORM:DATA also applies to it
+        self.data_format('ASC')
         self.com(':SENS:SEGM:DATA', segment_str)
         self.output(1)
         self.Spar(Spar)
@@ -506,14 +785,13 @@ class E5071C():
         self.com('*CLS','')
 
         # Start measurement and wait for averages
-        self.com(':TRIG:SEQ:SINGLE','')
-        while int(self.com('*STB')) != 192:
-            time.sleep(0.5)
+        self.trigger_single()
+        self.wait_sweep(navg)
 
         # Receive data
-        x = np.asarray(self.freq_read(), dtype='float')/1e9
-        re = np.asarray(self.trace_read(1)[0], dtype='float')
-        im = np.asarray(self.trace_read(2)[0], dtype='float')
+        x = self.freq_read()/1e9
+        re = self.trace_read(1)[0]
+        im = self.trace_read(2)[0]
 
         # Reset device
         self.output(0)
@@ -527,4 +805,6 @@ class E5071C():
         self.com(':TRIG:SEQ:SOUR', 'INT')
         self.com(':SENS:SWE:TYPE', 'LIN')
 
+        if return_complex:
+            return x, re + 1j*im
         return x, re, im
@@ -7,6 +7,7 @@ import matplotlib.animation as animation
 from matplotlib.ticker import FormatStrFormatter
 import time
 import datetime as dt
+import telemetry
 
 _line_styles = ['r-',
                 'b-', 
@@ -17,22 +18,26 @@ _line_styles = ['r-',
                 'k-']
 
 class TcPlot():
-    def __init__(self, heater_names, thermometer_names, duration=120):
+    def __init__(self, heater_names, thermometer_names, duration=120, max_points=2000):
         """
         
         Keyword Parameters: 
            heater_names
            thermometer_names
-           duration            (in seconds)
+           duration            (in seconds), None to plot the whole history
+           max_points          Maximum number of points drawn per line.
+                               Longer spans are drawn from the min/max
+                               history, so a repaint costs the same
+                               however long the cooldown has run.
         """
         assert (len(heater_names)+len(thermometer_names)) <= len(_line_styles), f"We don't have enough colors for {len(samples)} samples.  Maximum is {len(_line_styles)}."
 
         self.heater_names      = heater_names
         self.thermometer_names = thermometer_names
-        self.x                 = []
-        self.ys                = [[]] * (len(heater_names) + len(thermometer_names))
+        self.telemetry         = telemetry.TelemetryStore(len(heater_names) + len(thermometer_names))
 
         self.Span = duration      # timespan to plot (in seconds)
+        self.MaxPoints = max_points  # maximum number of points per line
         self.PaintInterval = 1.0  # period between plot updates (in seconds)
         self.Closed = False       # has user closed the plot window?
         self.OnClosed = None      # callback function called on window close.
@@ -61,9 +66,9 @@ class TcPlot():
         self.ax2.grid(color='b', linestyle=':', linewidth=1)
         
         # Create a line for each heater and sensor
-        self.lines = [None] * len(self.ys)
+        self.lines = [None] * self.telemetry.n_channels
         for i in range(len(self.lines)):
-            self.lines[i], = self._axis(i).plot(self.x, self.ys[i], _line_styles[i])
+            self.lines[i], = self._axis(i).plot([], [], _line_styles[i])
 
         # Add a legend to the plot.
         labels = [f"{h} (W)" for h in self.heater_names]+[f"{t} (K)" for t in self.thermometer_names]
@@ -101,8 +106,7 @@ class TcPlot():
     def clear(self):
         
         # Remove all existing data
-        self.x  = []
-        self.ys = [[]] * len(self.ys)
+        self.telemetry.clear()
         
         # Capture the start time to calculate elapsed time later within update()
         self.start = dt.datetime.now()
@@ -112,7 +116,7 @@ class TcPlot():
 
         samples = heaters + thermometers
 
-        assert len(samples) == len(self.ys), f"Must provide a total of {len(samples)} samples."
+        assert len(samples) == len(self.lines), f"Must provide a total of {len(self.lines)} samples."
         
         if self.Closed:
             return
@@ -122,19 +126,9 @@ class TcPlot():
         deltaT = (n - self.start)
         elapsed = deltaT.total_seconds()
 
-        # Capture the minimum timestamp of data allowed to remain within the plot
-        minsec = elapsed - self.Span
-
-        # Delete all data that is too old
-        while len(self.x) > 0 and self.x[0] < minsec:
-            self.x = self.x[1:]
-            for i in range(len(self.ys)):
-                self.ys[i] = self.ys[i][1:]
-
-        # Add the new samples
-        self.x.append(elapsed)
-        for i in range(len(self.ys)):
-            self.ys[i] = self.ys[i] + [samples[i]]
+        # Add the new samples, the telemetry store has a fixed size so
+        # old data doesn't need to be deleted
+        self.telemetry.append(elapsed, samples)
 
         # Calc the time elasped since the last paint of the plot
         elapsed = (dt.datetime.now() - self.lastPaintTime).total_seconds()
@@ -144,9 +138,10 @@ class TcPlot():
 
             self.lastPaintTime = dt.datetime.now()
 
+            (x, ys) = self.telemetry.envelope(self.Span, self.MaxPoints)
             for i in range(len(self.lines)):
-                self.lines[i].set_xdata(self.x)
-                self.lines[i].set_ydata(self.ys[i])
+                self.lines[i].set_xdata(x)
+                self.lines[i].set_ydata(ys[:, i])
 
             self.ax1.relim()
             self.ax1.autoscale_view()
@@ -154,7 +149,9 @@ class TcPlot():
             self.ax2.relim()
             self.ax2.autoscale_view()
 
-        # Redraw        
-        self.fig.canvas.draw()
+            # Redraw        
+            self.fig.canvas.draw()
+
+        # Process GUI events
         plt.pause(0.001)
 
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+
+"""asyncio version of genericcryostat.GenericCryostat
+"""
+
+import sys
+import os
+import async_instrument
+import genericcryostat
+
+from genericcryostat import PidScheduleItem
+
+
+class AsyncGenericCryostat(async_instrument.AsyncInstrument):
+    """Functionality common to all cryostat instruments, with coroutines
+    instead of blocking REST calls.
+    """
+    def __init__(self, ip, port, version='v1', verbose=False, tunnel=False,
+                 pool_size=None, timeout=None):
+        super().__init__(ip=ip,
+                         port=port,
+                         version=version,
+                         verbose=verbose,
+                         tunnel=tunnel,
+                         pool_size=pool_size,
+                         timeout=timeout)
+        return
+
+    # The endpoint names don't need any REST calls, so they are shared
+    # with the blocking class.
+    cryo_tc_channel_endpoint_root            = genericcryostat.GenericCryostat.cryo_tc_channel_endpoint_root
+    _tc_root                                 = genericcryostat.GenericCryostat._tc_root
+    cryo_tc_pid_schedule_endpoint            = genericcryostat.GenericCryostat.cryo_tc_pid_schedule_endpoint
+    cryo_thermometer_channel_sample_endpoint = genericcryostat.GenericCryostat.cryo_thermometer_channel_sample_endpoint
+    cryo_heater_channel_sample_endpoint      = genericcryostat.GenericCryostat.cryo_heater_channel_sample_endpoint
+    cryo_onoff_channel_sample_endpoint       = genericcryostat.GenericCryostat.cryo_onoff_channel_sample_endpoint
+
+    async def cryo_thermometer_channels(self) -> [tuple]:
+        """Return names of the thermometers for s and xp series Cryostations
+
+        Return
+           tuple(location, channel)
+           example ('sampleChamber', 'platform')
+        """
+        return list(set([(x[4], x[6]) for x in [x.split('/') for x in await self.get_prop('/')] if genericcryostat.is_tc(x)]))
+
+    async def cryo_thermometer_channels_by_name(self) -> dict:
+        return { x[1]: x for x in await self.cryo_thermometer_channels() }
+
+    async def get_thermometer_samples(self, channels=None) -> dict:
+        """Read the thermometer samples of several channels concurrently
+
+        Keyword arguments:
+           channels    List of (location, channel) pairs, all the
+                       thermometers of the cryostat if None.
+
+        Return
+           {channel: sample} dictionary
+        """
+        if channels is None: channels = await self.cryo_thermometer_channels()
+        r = await self.gather_props([self.cryo_thermometer_channel_sample_endpoint(c) for c in channels])
+        return { c: x['sample'] for c, x in zip(channels, r) }
+
+    async def set_on_off_power(self, channel: tuple, value: float) -> None:
+        path = self._tc_root(channel) + "/properties/onOffPower"
+        return await self.set_prop(path, {'onOffPower': value})
+
+    async def set_on_off_hysteresis(self, channel: int, value: float) -> None:
+        path = self._tc_root(channel) + "/properties/onOffHysteresis"
+        return await self.set_prop(path, {'onOffHysteresis': value})
+
+    async def enable_controller(self, channel, mode, temperature):
+        assert mode in ('OnOff', 'PID')
+        root = self.cryo_tc_channel_endpoint_root(channel)
+        return await self.call_method(root + "/methods/enableController(ControlMode:mode,double:temperature)",
+                                      {'mode':         mode,
+                                       'temperature':  temperature})
+
+    async def disable_controller(self, channel):
+        return await self.call_method(self.cryo_tc_channel_endpoint_root(channel)
+                                      + "/methods/disableController()")
+
+    async def get_tc_pid_schedule(self, channel: (str,str)) -> [PidScheduleItem]:
+        """Return the PID schedule for the temperature controller.
+        """
+        try:
+            sched = await self.get_prop(self.cryo_tc_pid_schedule_endpoint(channel))
+        except async_instrument.ApiError:
+            print("Failed to get pid schedule")
+            sched = {'pidSchedule': {'rows': []}}
+        return sorted([PidScheduleItem(temperature = row['temperature'],
+                                       kc          = row['kc'],
+                                       ti          = row['ti'],
+                                       td          = row['td'])
+                       for row in sched['pidSchedule']['rows']])
+
+    async def set_tc_pid_schedule(self,
+                                  channel: (str,str),
+                                  sched:   [PidScheduleItem]) -> None:
+        """Store the PID schedule on the system.
+        """
+        data = {'rows': [{'temperature': r.temperature, 'kc': r.kc, 'ti': r.ti, 'td': r.td}
+                                         for r in sched]}
+        await self.set_prop(self.cryo_tc_pid_schedule_endpoint(channel), data)
+        return
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+#
+# asyncio version of instrument.Instrument, so that several REST
+# calls to an instrument can be in flight at the same time.
+#
+# Example usage:
+#  import asyncio
+#  import async_instrument
+#
+#  async def main():
+#      async with async_instrument.AsyncInstrument('192.168.45.123', port=47101, version='v1') as inst:
+#          stage1, platform = await inst.gather_props(
+#              ['/cooler/temperatureControllers/stage1/thermometer/properties/sample',
+#               '/sampleChamber/temperatureControllers/platform/thermometer/properties/sample'])
+#
+#  asyncio.run(main())
+#
+import asyncio
+import json
+
+# httpx is optional, only needed for the async instrument classes
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import ssh_tunnel
+import instrument
+
+from instrument import ApiError, BadUrl, NotConnected, TunnelError
+
+# Requests awaited together are sent on parallel connections, so the
+# pool is larger than for the blocking Instrument.
+default_pool_size = 8
+
+
+class AsyncInstrument:
+    def __init__(self, ip, port, version, verbose=False, tunnel=False,
+                 pool_size=None, timeout=None):
+        """Create a base asyncio instrument object for Scripting R3
+
+        Same arguments as instrument.Instrument.  The get_prop(),
+        set_prop() and call_method() methods are coroutines, calls
+        that are awaited together share the keep-alive connection
+        pool of the instrument.
+
+        Keyword arguments:
+          ip        -- IP address (or hostname) of the instrument
+          port      -- TCP Port number of the service on the MIEC.
+          version   -- REST API version (e.g. "v1")
+          verbose   -- Print debug information?
+          tunnel    -- Communicate through a secure SSH tunnel?
+          pool_size -- Maximum number of concurrent connections to the
+                       instrument (default: default_pool_size)
+          timeout   -- Timeout in seconds of each REST call, either a number
+                       or a (connect, read) pair (default: instrument.default_timeout)
+        """
+        if httpx is None:
+            raise ImportError('httpx is required for the async instrument classes, install with "pip install httpx".')
+        assert not isinstance(port, (list,tuple)), "This class can only talk to a single port"
+
+        self.tun    = None
+        self.client = None
+        (self.ip, self.port, tunnel) = instrument._rewrite_connection(ip, port, tunnel)
+
+        self.version = version
+        self.verbose = verbose
+
+        if tunnel:
+            try:
+                self.tun  = ssh_tunnel.tunnel(remote_host = ip, remote_ports = port)
+            except:
+                raise TunnelError("Could not start the ssh tunnel.  Have you copied your ssh keys?")
+            self.ip   = self.tun.local_bind_address[0]
+            self.port = self.tun.local_bind_ports[0]
+
+        if pool_size is None: pool_size = default_pool_size
+        if timeout is None:   timeout   = instrument.default_timeout
+        if isinstance(timeout, (list, tuple)):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        self.client = httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size,
+                                                            max_keepalive_connections=pool_size),
+                                        timeout=timeout)
+        return
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        if self.tun is not None:
+            self.tun.stop()
+        self.ip      = None
+        self.port    = None
+        self.version = None
+        self.verbose = None
+        self.tun     = None
+        self.client  = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def url(self, path):
+        if self.ip is None: raise NotConnected()
+
+        root = f'http://{self.ip}:{self.port}/{self.version}'
+
+        path = path.strip('/')
+        path = path.replace('//', '/')
+
+        return f'{root}/{path}'
+
+    async def is_up(self):
+        """Is the instrument responding?
+        """
+        result = False
+
+        try:
+            tmp = await self.get_prop("/version")
+            result = True
+        except ApiError:
+            # An API error means the instrument is up and running.
+            result = True
+        except httpx.TransportError:
+            await self.close()
+        except NotConnected:
+            await self.close()
+        return result
+
+    async def call_method(self, path, data=None):
+        """Call a method to perform some action with the instrument.
+
+        """
+        uri = self.url(path)
+        if (data is not None):
+            if (self.verbose): print(f'POST {uri} [data -> {data}]')
+            resp = await self.client.post(uri, json=data)
+        else:
+            if (self.verbose): print(f'POST {uri}')
+            resp = await self.client.post(uri)
+
+        instrument._verifySuccess('POST', path, resp)
+
+        c = resp.content.decode('utf-8')
+        if c != '':
+            return json.loads(c)
+
+    async def set_prop(self, path, data=None):
+        uri = self.url(path)
+
+        if (self.verbose): print(f'PUT {uri} [data -> {data}]')
+        resp = await self.client.put(uri, json=data)
+
+        instrument._verifySuccess('PUT', path, resp)
+
+        c = resp.content.decode('utf-8')
+        if c != '':
+            return json.loads(c)
+
+    async def get_prop(self, path, params=None):
+        """Retrieve a property value via REST from the instrument
+
+        Keyword arguments:
+           path    The non-root portion of the URI.
+                   e.g. "/controller1/thermometer/properties/sample"
+           params  (optional) Any parameters that need to be passed
+                   along in the GET message.
+        """
+        uri = self.url(path)
+        if (self.verbose): print(f'GET {uri} [params -> {params}]')
+        try:
+            resp = await self.client.get(uri, params=params)
+        except httpx.InvalidURL:
+            raise BadUrl() from None
+
+        instrument._verifySuccess('GET', path, resp)
+
+        c = resp.content.decode('utf-8')
+        result = None
+        if c != '': result = json.loads(c)
+
+        return result
+
+    async def gather_props(self, paths):
+        """Retrieve several property values concurrently
+
+        All the GETs are sent at once, so reading N properties costs
+        about one round trip instead of N.
+
+        Keyword arguments:
+           paths   List of non-root portions of the URIs.
+
+        Return
+           List of the property values, in the same order as paths.
+        """
+        return list(await asyncio.gather(*[self.get_prop(p) for p in paths]))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#
+"""
+asyncio version of scryostation.SCryostation, to read the status of
+the s-series Cryostation with concurrent REST calls.
+
+Example usage:
+ import asyncio
+ import async_scryostation
+
+ async def main():
+     async with async_scryostation.AsyncSCryostation('192.168.1.123') as cryo:
+         status = await cryo.get_status()   # about one round trip
+         print(status['platform_temperature'], status['platform_temperature_stability'])
+
+ asyncio.run(main())
+"""
+import sys
+import os
+import asyncio
+import instrument
+import async_genericcryostat
+
+Ports = instrument.Rest_Ports
+
+_stage1_sample   = '/cooler/temperatureControllers/stage1/thermometer/properties/sample'
+_stage2_sample   = '/cooler/temperatureControllers/stage2/thermometer/properties/sample'
+_platform_sample = '/sampleChamber/temperatureControllers/platform/thermometer/properties/sample'
+_platform_heater = '/sampleChamber/temperatureControllers/platform/heater/properties/sample'
+_pressure_sample = '/vacuumSystem/vacuumGauges/sampleChamberPressure/properties/pressureSample'
+
+
+class AsyncSCryostation(async_genericcryostat.AsyncGenericCryostat):
+    def __init__(self, ip, version='v1', verbose=False, tunnel=False, port=Ports.scryostation_hlm,
+                 pool_size=None, timeout=None):
+        super().__init__(ip=ip,
+                         port=port,
+                         version=version,
+                         verbose=verbose,
+                         tunnel=tunnel,
+                         pool_size=pool_size,
+                         timeout=timeout)
+
+    async def cooldown(self):
+        await self.call_method('/controller/methods/cooldown()')
+
+    async def warmup(self):
+        await self.call_method('/controller/methods/warmup()')
+
+    async def abort_goal(self):
+        await self.call_method('/controller/methods/abortGoal()')
+
+    async def get_system_goal(self):
+        return (await self.get_prop('/controller/properties/systemGoal'))['systemGoal']
+
+    async def get_system_state(self):
+        return (await self.get_prop('/controller/properties/systemState'))['systemState']
+
+    async def get_sample_chamber_pressure(self):
+        return (await self.get_prop(_pressure_sample))['pressureSample']['pressure']
+
+    async def get_stage1_temperature(self):
+        r = await self.get_prop(_stage1_sample)
+        return r['sample']['temperatureOK'], r['sample']['temperature']
+
+    async def get_stage2_temperature(self):
+        r = await self.get_prop(_stage2_sample)
+        return r['sample']['temperatureOK'], r['sample']['temperature']
+
+    async def get_platform_target_temperature(self):
+        r = await self.get_prop('/controller/properties/platformTargetTemperature')
+        return r['platformTargetTemperature']
+
+    async def set_platform_target_temperature(self, target):
+        return await self.set_prop('/controller/properties/platformTargetTemperature', target)
+
+    async def set_platform_stability_target(self, target):
+        return await self.set_prop('/sampleChamber/temperatureControllers/platform/thermometer/properties/stabilityTarget', target)
+
+    async def get_platform_temperature(self):
+        r = await self.get_prop(_platform_sample)
+        return r['sample']['temperatureOK'], r['sample']['temperature']
+
+    async def get_platform_temperature_stability(self):
+        r = await self.get_prop(_platform_sample)
+        return r['sample']['temperatureStabilityOK'], r['sample']['temperatureStability']
+
+    async def get_platform_heater_sample(self):
+        r = await self.get_prop(_platform_heater)
+        return r['sample']
+
+    async def get_status(self) -> dict:
+        """Read temperatures, heater sample, pressure and stability concurrently
+
+        The platform temperature and stability come from the same
+        endpoint, so this is five concurrent GETs instead of six
+        serial ones.
+        """
+        (stage1, stage2, platform, heater, pressure) = await self.gather_props(
+            [_stage1_sample, _stage2_sample, _platform_sample, _platform_heater, _pressure_sample])
+        return {'stage1_temperature':             stage1['sample']['temperature'],
+                'stage2_temperature':             stage2['sample']['temperature'],
+                'platform_temperature':           platform['sample']['temperature'],
+                'platform_temperature_stability': platform['sample']['temperatureStability'],
+                'platform_heater_sample':         heater['sample'],
+                'sample_chamber_pressure':        pressure['pressureSample']['pressure']}
+
+
+if __name__ == "__main__":
+
+    async def main(ip):
+        async with AsyncSCryostation(ip) as cryo:
+            for key, val in (await cryo.get_status()).items():
+                print(f'{key}: {val}')
+
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'localhost'))
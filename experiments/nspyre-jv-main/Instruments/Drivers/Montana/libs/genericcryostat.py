@@ -6,6 +6,13 @@
 
 import sys
 import os
+import os.path as op
+import time
+import json
+import hashlib
+import concurrent.futures
+import numpy as np
+import requests
 import instrument 
 
 class PidScheduleItem:
@@ -23,6 +30,35 @@ class PidScheduleItem:
     def __repr__(self):
         return repr((self.temperature, self.kc, self.ti, self.td))
 
+def _sample_fields(sample):
+    """The numeric fields of a sample, as a list of (key, 'bool' or 'float')"""
+    if not isinstance(sample, dict): return []
+    return [(key, 'bool' if isinstance(val, bool) else 'float')
+            for key, val in sample.items() if isinstance(val, (bool, int, float))]
+
+def is_tc(x):
+    """Determine if endpoint is a TC (temperature controller)
+
+    We use this to filter out all the non-TC endpoints when we
+    iterate through the list of all endpoints.  x is the endpoint URL
+    split at '/'.
+    """
+    return (len(x)==10
+            and x[3]=='v1'
+            # and x[4] in ('cooler', 'sampleChamber', 'magnet')
+            and x[5]=='temperatureControllers'
+            and x[7:10]==['thermometer', 'properties', 'sample'])
+
+# The channel names and snapshot endpoints found on a cryostat are kept
+# in a json file per instrument in this folder, so scripts don't have
+# to walk the REST tree again each time they start.  Only what is fixed
+# by the hardware and firmware is kept, never settings.
+discovery_cache_dir = op.join(op.expanduser('~'), '.montana_cache')
+
+# Number of tries of each snapshot endpoint when they are looked up,
+# for endpoints that fail with something else than a 404.
+probe_attempts = 3
+
     
 class GenericCryostat(instrument.Instrument):
     """Functionality common to all cryostat instruments. 
@@ -30,34 +66,99 @@ class GenericCryostat(instrument.Instrument):
     All derived classes should register themselves using the
     @genericcryostat.register decorator. 
     """
-    def __init__(self, ip, port, version='v1', verbose=False, tunnel=False):
+    def __init__(self, ip, port, version='v1', verbose=False, tunnel=False,
+                 pool_size=None, timeout=None):
         super().__init__(ip=ip,
                          port=port,
                          version=version,
                          verbose=verbose,
-                         tunnel=tunnel)
+                         tunnel=tunnel,
+                         pool_size=pool_size,
+                         timeout=timeout)
+        self._snapshot_endpoints = None
+        self._snapshot_dtype     = None
+        self._snapshot_pool      = None
+        self._discovery          = None
         return
+
+    def close(self):
+        if getattr(self, '_snapshot_pool', None) is not None:
+            self._snapshot_pool.shutdown()
+            self._snapshot_pool = None
+        # A reconnect may be to an updated or different instrument,
+        # so the discovery cache is checked again after close.
+        self._discovery          = None
+        self._snapshot_endpoints = None
+        self._snapshot_dtype     = None
+        super().close()
+
+    #
+    # Discovery cache
+    #
+    def _discovery_cache_file(self):
+        """Name of the cache file for this instrument.
+
+        The file is keyed by the contents of the /version endpoint
+        (serial number and firmware version), so a firmware update or
+        a different instrument on the same address gets a new cache.
+        """
+        try:
+            key = json.dumps(self.get_prop('/version'), sort_keys=True)
+        except instrument.ApiError:
+            key = f'{self.ip}:{self.port}'
+        key = f'{type(self).__name__}/{self.version}/{key}'
+        return op.join(discovery_cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _discovery_cache(self) -> dict:
+        """The discovery cache, loaded from disk on first use after connecting"""
+        if self._discovery is None:
+            self._discovery = {'file': self._discovery_cache_file(), 'data': {}}
+            try:
+                with open(self._discovery['file']) as f:
+                    self._discovery['data'] = json.load(f)
+                # Settings are never cached, only what is fixed by the
+                # hardware and firmware
+                self._discovery['data'].pop('pid_schedules', None)
+            except (OSError, ValueError):
+                pass
+        return self._discovery['data']
+
+    def _save_discovery_cache(self):
+        try:
+            os.makedirs(discovery_cache_dir, exist_ok=True)
+            with open(self._discovery['file'] + '.tmp', 'w') as f:
+                json.dump(self._discovery['data'], f)
+            os.replace(self._discovery['file'] + '.tmp', self._discovery['file'])
+        except OSError as e:
+            sys.stderr.write(f"could not save the discovery cache: {e}\n")
+
+    def invalidate_discovery_cache(self):
+        """Forget everything discovered on this instrument, in memory and on disk"""
+        cache_file = self._discovery_cache_file()
+        if op.exists(cache_file): os.remove(cache_file)
+        self._discovery          = None
+        self._snapshot_endpoints = None
+        self._snapshot_dtype     = None
     
     def cryo_thermometer_channels(self) -> [tuple]:
         """Return names of the thermometers for s and xp series Cryostations
 
+        The REST tree is only searched the first time, the result is
+        kept in the discovery cache.
+
         Return 
            tuple(location, channel) 
            example ('sampleChamber', 'platform')
         """
+        cache = self._discovery_cache()
+        if 'channels' not in cache:
+            cache['channels'] = self._discover_thermometer_channels()
+            self._save_discovery_cache()
+        return [tuple(x) for x in cache['channels']]
+
+    def _discover_thermometer_channels(self) -> [tuple]:
+        """Search the REST tree of the instrument for thermometers"""
 
-        def is_tc(x):
-            """Determine if endpoint is a TC (temperature controller)
-
-            We use this to filter out all the non-TC endpoints when we
-            iterate through the list of all endpoints.
-            """
-            return (len(x)==10
-                    and x[3]=='v1'
-                    # and x[4] in ('cooler', 'sampleChamber', 'magnet')
-                    and x[5]=='temperatureControllers'
-                    and x[7:10]==['thermometer', 'properties', 'sample'])
-            
         # First we'll search for endpoints match the following pattern
         #   0    1       2             3           4                              5            6      7          8        9
         #  http://192.168.45.184:47103/v1/{cooler|sampleChamber|magnet}/temperatureControllers/*/thermometer/properties/sample
@@ -163,6 +264,10 @@ class GenericCryostat(instrument.Instrument):
     def get_tc_pid_schedule(self, channel: (str,str)) -> [PidScheduleItem]:
         """Return the PID schedule for the temperature controller. 
 
+        The schedule is a setting that can be changed from elsewhere
+        (e.g. the touchscreen), so it is always read from the system
+        and never kept in the discovery cache.
+
         Keywords arguments:
            channel     A pair of strings.  First item is the name of the 
                        chamber (e.g. sampleChamber).  Second item is the channel
@@ -194,6 +299,153 @@ class GenericCryostat(instrument.Instrument):
         return 
         
 
+    #
+    # Snapshot of all the temperature controllers
+    #
+    def _resolve_snapshot_endpoints(self, onoff=True):
+        """Find the sample endpoints of every temperature controller channel
+
+        Endpoints that don't exist on this cryostat (a 404 or bad URL,
+        e.g. a channel without heater) are dropped, so later snapshots
+        only ask for what is there.  The numeric fields of each sample
+        are recorded, they fix the columns of the snapshot records.
+
+        Endpoints that fail for another reason (timeout, network error)
+        are tried again up to probe_attempts times.  If one still fails
+        it is kept without fields, and the result is incomplete.
+
+        Return
+           (endpoints, complete): endpoints is a list of (name, endpoint,
+           fields) where name is e.g. "platform_heater" and fields is a
+           list of (key, kind), kind is 'bool' or 'float'.  complete is
+           False if some endpoints could not be probed.
+        """
+        candidates = []
+        for channel in sorted(self.cryo_thermometer_channels()):
+            candidates.append((f'{channel[1]}_thermometer', self.cryo_thermometer_channel_sample_endpoint(channel)))
+            candidates.append((f'{channel[1]}_heater',      self.cryo_heater_channel_sample_endpoint(channel)))
+            if onoff:
+                candidates.append((f'{channel[1]}_onoff',   self.cryo_onoff_channel_sample_endpoint(channel)))
+
+        results = {}   # endpoint -> (sample, missing)
+        pending = [ep for name, ep in candidates]
+        for attempt in range(probe_attempts):
+            for ep, result in zip(pending, self._probe_samples(pending)):
+                results[ep] = result
+            pending = [ep for ep in pending if results[ep] == (None, False)]
+            if not pending: break
+
+        endpoints = []
+        for name, ep in candidates:
+            (sample, missing) = results[ep]
+            if not missing:
+                endpoints.append((name, ep, _sample_fields(sample)))
+        if pending:
+            sys.stderr.write(f"could not probe the snapshot endpoints {pending}\n")
+        return (endpoints, not pending)
+
+    def _fetch_sample(self, ep):
+        """GET a sample endpoint
+
+        Return
+           (sample, missing): sample is None if it could not be read,
+           missing is True if the endpoint doesn't exist (404 or bad
+           URL), False for other errors (e.g. a timeout)
+        """
+        try:
+            r = self.get_prop(ep)
+        except instrument.BadUrl:
+            return (None, True)
+        except instrument.ApiError as e:
+            return (None, e.response_code == 404)
+        except requests.exceptions.RequestException:
+            # a slow or dropped channel must not stop the other ones
+            return (None, False)
+        # the samples are wrapped in a single key, e.g. {'sample': {...}}
+        if isinstance(r, dict) and len(r) == 1:
+            r = next(iter(r.values()))
+        return (r, False)
+
+    def _probe_samples(self, endpoints):
+        """_fetch_sample of every endpoint, concurrently"""
+        if self._snapshot_pool is None:
+            self._snapshot_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.pool_size)
+        return list(self._snapshot_pool.map(self._fetch_sample, endpoints))
+
+    def _fetch_samples(self, endpoints):
+        """GET every endpoint concurrently, None for the ones that failed"""
+        return [sample for (sample, missing) in self._probe_samples(endpoints)]
+
+    def snapshot_dtype(self, onoff=True):
+        """The numpy dtype of the records returned by snapshot()
+
+        Useful to preallocate a log, e.g.
+            log = np.zeros(36000, dtype=cryo.snapshot_dtype())
+            log[i] = cryo.snapshot()
+        """
+        if self._snapshot_dtype is None:
+            self._setup_snapshot(onoff)
+        return self._snapshot_dtype
+
+    def _setup_snapshot(self, onoff=True):
+        """Look up the snapshot endpoints (discovery cache) and the record dtype"""
+        cache = self._discovery_cache()
+        key = 'snapshot_endpoints' if onoff else 'snapshot_endpoints_no_onoff'
+        # entries written before the fields were recorded have no fields
+        if key in cache and all(len(x) == 3 for x in cache[key]):
+            endpoints = cache[key]
+        else:
+            (endpoints, complete) = self._resolve_snapshot_endpoints(onoff)
+            # a transient error must not drop a channel for good, so an
+            # incomplete list is only used until the next connect
+            if complete:
+                cache[key] = endpoints
+                self._save_discovery_cache()
+        self._snapshot_endpoints = [(name, ep, [tuple(f) for f in fields]) for name, ep, fields in endpoints]
+        # the fields are fixed by the resolved endpoints, not by whatever a live sample returns
+        self._snapshot_dtype = np.dtype([('time', np.float64)] +
+                                        [(f'{name}_{field}', np.bool_ if kind == 'bool' else np.float64)
+                                         for name, ep, fields in self._snapshot_endpoints
+                                         for field, kind in fields])
+
+    def snapshot(self, onoff=True):
+        """Read the thermometer, heater and on/off samples of all channels
+
+        The endpoints are looked up on the first call only, and all the
+        samples are fetched concurrently in a thread pool, so a
+        snapshot costs about one REST round trip per pool_size channels.
+
+        Keyword arguments:
+           onoff   Also read the on/off controller samples?  Only used
+                   on the first call, when the endpoints are looked up.
+
+        Return
+           numpy record with a 'time' field (seconds since the epoch, when
+           the request was sent) and one field per numeric value of each
+           sample, e.g. 'platform_thermometer_temperature'.  Values that
+           could not be read are NaN.
+        """
+        if self._snapshot_endpoints is None:
+            self._setup_snapshot(onoff)
+
+        t = time.time()
+        samples = self._fetch_samples([ep for name, ep, fields in self._snapshot_endpoints])
+
+        values = {'time': t}
+        for (name, ep, fields), sample in zip(self._snapshot_endpoints, samples):
+            if not isinstance(sample, dict): continue
+            for key, val in sample.items():
+                if isinstance(val, (bool, int, float)):
+                    values[f'{name}_{key}'] = val
+
+        record = np.zeros(1, dtype=self._snapshot_dtype)[0]
+        for key in self._snapshot_dtype.names:
+            if key in values:
+                record[key] = values[key]
+            elif self._snapshot_dtype[key] != np.bool_:
+                record[key] = np.nan
+        return record
+
     
 _cryo_classes = {}
 def register_cryo_class(cls, create=None):
@@ -14,6 +14,7 @@ sys.path.append(op.abspath(op.join(op.dirname(__file__), os.pardir, os.pardir, '
 
 from enum import IntEnum
 import requests
+import requests.adapters
 import json
 import re
 import time
@@ -28,6 +29,13 @@ _force_ipv4 = True  # Some day IPv6 will be ubiquitous.  Today is not that day.
 
 _success = range(200,300)
 
+# Every Instrument keeps a pooled, keep-alive HTTP session so that
+# polling loops pay for the TCP connection (and the ssh tunnel channel)
+# only once.  These are the defaults, they can be overridden per
+# instrument with the pool_size and timeout keyword arguments.
+default_pool_size = 4        # connections kept open to the instrument
+default_timeout   = (3.05, 30)  # (connect, read) timeouts in seconds
+
 class Rest_Ports(IntEnum):
     """Constants for TCP port numbers of the various REST servers
     """
@@ -122,8 +130,21 @@ def _rewrite_connection(ip, port, tunnel):
             ip = socket.getaddrinfo(ip, None, socket.AF_INET)[0][4][0]
     return (ip, port, tunnel)
         
+def _make_session(pool_size):
+    """Create a requests session that keeps up to pool_size connections alive
+
+    Reusing the connections means a REST call costs a single round
+    trip instead of a TCP handshake (and a new tunnel channel) each time.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                            pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    return session
+
 class Instrument:
-    def __init__(self, ip, port, version, verbose=False, tunnel=False):
+    def __init__(self, ip, port, version, verbose=False, tunnel=False,
+                 pool_size=None, timeout=None):
         """Create a base instrument object for Scripting R3
 
         Keyword arguments:
@@ -139,10 +160,16 @@ class Instrument:
           version -- REST API version (e.g. "v1")
           verbose -- Print debug information?
           tunnel  -- Communicate through a secure SSH tunnel?
+          pool_size -- Number of keep-alive connections kept open to the
+                     instrument (default: default_pool_size)
+          timeout -- Timeout in seconds of each REST call, either a number
+                     or a (connect, read) pair (default: default_timeout)
         """
         assert not isinstance(port, (list,tuple)), "This class can only talk to a single port"
 
         self.tun     = None
+        self.session = None
+        self.timeout = default_timeout if timeout is None else timeout
         (self.ip, self.port, tunnel) = _rewrite_connection(ip, port, tunnel)
 
         self.version = version
@@ -155,9 +182,14 @@ class Instrument:
                 raise TunnelError("Could not start the ssh tunnel.  Have you copied your ssh keys?")
             self.ip   = self.tun.local_bind_address[0]
             self.port = self.tun.local_bind_ports[0]
+
+        self.pool_size = default_pool_size if pool_size is None else pool_size
+        self.session   = _make_session(self.pool_size)
         return
 
     def close(self):
+        if self.session is not None:
+            self.session.close()
         if self.tun is not None:
             self.tun.stop()
         self.ip      = None
@@ -165,6 +197,7 @@ class Instrument:
         self.version = None
         self.verbose = None
         self.tun     = None
+        self.session = None
 
 
     def __del__(self):
@@ -225,10 +258,10 @@ class Instrument:
         uri = self.url(path)
         if (data is not None):
             if (self.verbose): print(f'POST {uri} [data -> {data}]')
-            resp = requests.post(uri, json=data)
+            resp = self.session.post(uri, json=data, timeout=self.timeout)
         else:
             if (self.verbose): print(f'POST {uri}')
-            resp = requests.post(uri)
+            resp = self.session.post(uri, timeout=self.timeout)
 
         _verifySuccess('POST', path, resp)
 
@@ -240,7 +273,7 @@ class Instrument:
         uri = self.url(path)
 
         if (self.verbose): print(f'PUT {uri} [data -> {data}]')
-        resp = requests.put(uri, json=data)
+        resp = self.session.put(uri, json=data, timeout=self.timeout)
 
         _verifySuccess('PUT', path, resp)
 
@@ -261,7 +294,7 @@ class Instrument:
         if (self.verbose): print(f'GET {uri} [params -> {params}]')
         try:
             # print(f"uri is |{uri}|")
-            resp = requests.get(uri, params)
+            resp = self.session.get(uri, params=params, timeout=self.timeout)
         except requests.exceptions.InvalidURL:
             raise BadUrl() from None
         except requests.exceptions.ConnectionError:
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+"""Waiting for axis motion to complete, shared by Rook and Positioner
+
+Instead of polling at a fixed interval, the wait first sleeps through
+most of the expected duration of the move (if known), then polls
+starting at a sub-millisecond interval that grows geometrically up to
+max_poll.  A short move is seen as complete within about a REST round
+trip, while a long move doesn't flood the controller with requests.
+"""
+
+import asyncio
+import time
+
+min_poll_interval = 5e-4   # first poll interval after the expected end of the move (s)
+max_poll_interval = 0.1    # poll interval is never longer than this (s)
+poll_backoff      = 1.5    # factor by which the poll interval grows
+early_fraction    = 0.9    # fraction of the expected move time slept before polling starts
+
+
+def poll_intervals(expected_time=None,
+                   min_poll=None,
+                   max_poll=None,
+                   backoff=None):
+    """Generate the successive delays before each poll
+
+    Keyword arguments:
+       expected_time   Estimate of the move duration in seconds, or None.
+       min_poll        First poll interval (default min_poll_interval)
+       max_poll        Longest poll interval (default max_poll_interval)
+       backoff         Growth factor of the interval (default poll_backoff)
+    """
+    if min_poll is None: min_poll = min_poll_interval
+    if max_poll is None: max_poll = max_poll_interval
+    if backoff  is None: backoff  = poll_backoff
+
+    if expected_time is not None and expected_time > 0:
+        yield early_fraction * expected_time
+    interval = min_poll
+    while True:
+        yield interval
+        interval = min(interval * backoff, max_poll)
+
+
+def wait_until(done, max_wait, expected_time=None, **kwargs):
+    """Call done() with adaptive polling until it returns True
+
+    Keyword arguments:
+       done            Function returning True once the motion is complete
+       max_wait        Timeout in seconds
+       expected_time   Estimate of the move duration in seconds, or None
+       kwargs          Passed to poll_intervals()
+
+    Return
+       True if done() returned True before the timeout, False otherwise.
+    """
+    deadline = time.monotonic() + max_wait
+    for delay in poll_intervals(expected_time, **kwargs):
+        time.sleep(max(0, min(delay, deadline - time.monotonic())))
+        if done():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+
+
+async def wait_until_async(done, max_wait, expected_time=None, **kwargs):
+    """Same as wait_until(), but awaitable.
+
+    done() is a blocking function (e.g. a REST call), it is run in a
+    worker thread so other tasks keep running while it waits.
+    """
+    deadline = time.monotonic() + max_wait
+    for delay in poll_intervals(expected_time, **kwargs):
+        await asyncio.sleep(max(0, min(delay, deadline - time.monotonic())))
+        if await asyncio.get_running_loop().run_in_executor(None, done):
+            return True
+        if time.monotonic() >= deadline:
+            return False
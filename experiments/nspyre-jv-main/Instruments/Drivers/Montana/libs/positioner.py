@@ -4,6 +4,10 @@
 import sys
 import os
 import instrument
+import motion
+import time
+import datetime
+import asyncio
 
 class Positioner(instrument.Instrument):
     def __init__(self, ip, version='v1', verbose=False, tunnel=False):
@@ -12,6 +16,20 @@ class Positioner(instrument.Instrument):
                          version=version,
                          verbose=verbose,
                          tunnel=tunnel)
+        # Last number of steps and frequency (Hz) of each (stack, axis),
+        # used to estimate the step time without a REST call per step.
+        # Changes made from another client or the GUI are not seen, call
+        # invalidate_axis_settings() after them.
+        self._num_steps = {}
+        self._frequency = {}
+
+    def invalidate_axis_settings(self, stack=None, axis=None):
+        """Forget the cached number of steps and frequency, of one axis
+           or of all of them, so they are read again from the positioner"""
+        for cache in (self._num_steps, self._frequency):
+            for key in list(cache):
+                if (stack is None or key[0] == stack) and (axis is None or key[1] == axis):
+                    del cache[key]
 
     def axis_busy(self, stack, axis):
         """Is stack currently busy on the given axis"""
@@ -21,7 +39,76 @@ class Positioner(instrument.Instrument):
     def set_axis_number_of_steps(self, stack, axis, num_steps):
         '''Set the number of steps to move each time move_axis_step is called'''
         self.set_prop(f'stack{stack}/axes/axis{axis}/properties/numberOfSteps', num_steps)
+        self._num_steps[(stack, axis)] = num_steps
         return
+
+    def get_axis_number_of_steps(self, stack, axis):
+        '''Get the number of steps moved each time move_axis_step is called'''
+        if (stack, axis) not in self._num_steps:
+            r = self.get_prop(f'stack{stack}/axes/axis{axis}/properties/numberOfSteps')
+            self._num_steps[(stack, axis)] = r['numberOfSteps']
+        return self._num_steps[(stack, axis)]
+
+    def get_axis_frequency(self, stack, axis):
+        '''Get the step frequency (Hz) of an axis'''
+        if (stack, axis) not in self._frequency:
+            r = self.get_prop(f'stack{stack}/axes/axis{axis}/properties/frequency')
+            self._frequency[(stack, axis)] = r['frequency']
+        return self._frequency[(stack, axis)]
+
+    def estimate_step_time(self, stack, axis):
+        '''Estimate how long (s) a call to move_axis_step keeps the axis busy'''
+        frequency = self.get_axis_frequency(stack, axis)
+        return self.get_axis_number_of_steps(stack, axis) / frequency if frequency else None
+
+    def _axis_settled(self, stack, axis, start_time=None, start_delay=0.05, expected_time=None):
+        """Return a function that tells if the axis finished its move.
+
+        Right after a move command the axis may not report busy yet, so
+        a 'not busy' read is ignored until the axis was seen busy, or
+        until min(start_delay, expected_time) after start_time.  Short
+        steps are then not held to start_delay.
+        """
+        if start_time is None: start_time = time.monotonic()
+        if expected_time is not None: start_delay = min(start_delay, expected_time)
+        seen_busy = False
+        def settled():
+            nonlocal seen_busy
+            if self.axis_busy(stack, axis):
+                seen_busy = True
+                return False
+            return seen_busy or time.monotonic() - start_time >= start_delay
+        return settled
+
+    def wait_for_axis_not_busy(self, stack, axis, max_wait=datetime.timedelta(seconds=30), expected_time=None):
+        """Returns True if the axis stopped before timeout, False otherwise.
+
+           The axis is polled adaptively (see motion.py): after
+           expected_time (s), if given, then with a sub-ms interval that
+           backs off, instead of a fixed delay per poll."""
+        return motion.wait_until(self._axis_settled(stack, axis, expected_time=expected_time),
+                                 max_wait.total_seconds(), expected_time)
+
+    def step_and_wait(self, stack, axis, move_positive_direction, max_wait=datetime.timedelta(seconds=30)):
+        '''Move the axis by one step command and wait until it is not busy'''
+        expected_time = self.estimate_step_time(stack, axis)
+        start_time = time.monotonic()
+        self.move_axis_step(stack, axis, move_positive_direction)
+        return motion.wait_until(self._axis_settled(stack, axis, start_time, expected_time=expected_time),
+                                 max_wait.total_seconds(),
+                                 expected_time)
+
+    async def move_and_settle(self, stack, axis, move_positive_direction, max_wait=datetime.timedelta(seconds=30)):
+        """Awaitable version of step_and_wait(), so that other tasks run
+        during the move.  Returns True if the axis stopped before timeout.
+        """
+        loop = asyncio.get_running_loop()
+        expected_time = await loop.run_in_executor(None, self.estimate_step_time, stack, axis)
+        start_time = time.monotonic()
+        await loop.run_in_executor(None, self.move_axis_step, stack, axis, move_positive_direction)
+        return await motion.wait_until_async(self._axis_settled(stack, axis, start_time, expected_time=expected_time),
+                                             max_wait.total_seconds(),
+                                             expected_time)
     
     def move_axis_step(self, stack, axis, move_positive_direction):
         '''Move axis in step mode'''
@@ -56,4 +143,5 @@ class Positioner(instrument.Instrument):
     def set_axis_frequency(self, stack, axis, frequency):
         '''Set the frequency (Hz) of an axis'''
         self.set_prop(f'stack{stack}/axes/axis{axis}/properties/frequency', frequency)
+        self._frequency[(stack, axis)] = frequency
         return
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""Pipelined 2-axis raster scan with a Rook positioner
+
+For each pixel the engine moves to the pixel, reads both encoder
+positions and calls the measurement.  These steps overlap wherever the
+stage doesn't need to be still:
+  - both encoder positions are read concurrently (one round trip)
+  - the pixel targets are computed up front, so the next move is sent
+    as soon as the measurement has acquired its data
+  - the readout of a pixel (e.g. transfer/processing of the data) runs
+    while the stage moves to the next pixel
+  - when both axes move (new row), they move concurrently
+
+Example usage:
+  import rook, rasterscan
+  stage = rook.Rook('192.168.1.123')
+  scan = rasterscan.RasterScan(stage, stack_num=1, slow_axis=2, fast_axis=1,
+                               slow_positions=np.linspace(0, 1e-4, 50),
+                               fast_positions=np.linspace(0, 1e-4, 50),
+                               measure=lambda s, f, slow_pos, fast_pos: daq.read()[0])
+  data = scan.run()       # scan.data is filled in real time
+"""
+
+import asyncio
+import datetime
+import numpy as np
+
+ORDERINGS = ('serpentine', 'unidirectional')
+
+
+def raster_order(n_slow, n_fast, ordering='serpentine'):
+    """List of (slow_index, fast_index) in the order the pixels are visited
+
+    Keyword arguments:
+       ordering   'serpentine': the fast axis changes direction every row,
+                  'unidirectional': every row is scanned in the same
+                  direction, the fast axis flies back at each new row.
+    """
+    if ordering not in ORDERINGS:
+        raise ValueError(f'unknown raster ordering "{ordering}", supported: {", ".join(ORDERINGS)}')
+    pixels = []
+    for s in range(n_slow):
+        fast = range(n_fast)
+        if ordering == 'serpentine' and s % 2 == 1:
+            fast = reversed(fast)
+        pixels.extend((s, f) for f in fast)
+    return pixels
+
+
+class RasterScan:
+    def __init__(self, stage, stack_num, slow_axis, fast_axis, slow_positions, fast_positions,
+                 measure, readout=None, on_pixel=None, ordering='serpentine',
+                 max_wait=datetime.timedelta(seconds=30)):
+        """
+        Keyword arguments:
+           stage            rook.Rook object
+           stack_num        Stack of the two axes
+           slow_axis        Axis number of the slow (row) axis
+           fast_axis        Axis number of the fast (column) axis
+           slow_positions   Absolute positions (m) of the rows
+           fast_positions   Absolute positions (m) of the columns
+           measure          measure(slow_idx, fast_idx, slow_pos, fast_pos),
+                            called with the stage at the pixel.  Returns the
+                            value of the pixel, or the raw data given to readout.
+           readout          (optional) readout(raw) -> value of the pixel.
+                            Runs while the stage moves to the next pixel.
+           on_pixel         (optional) on_pixel(slow_idx, fast_idx, value),
+                            called as each pixel is done, e.g. to update a plot
+           ordering         'serpentine' or 'unidirectional'
+           max_wait         Timeout of each move
+        """
+        self.stage          = stage
+        self.stack_num      = stack_num
+        self.slow_axis      = slow_axis
+        self.fast_axis      = fast_axis
+        self.slow_positions = np.asarray(slow_positions, dtype=np.float64)
+        self.fast_positions = np.asarray(fast_positions, dtype=np.float64)
+        self.measure        = measure
+        self.readout        = readout
+        self.on_pixel       = on_pixel
+        self.pixels         = raster_order(len(self.slow_positions), len(self.fast_positions), ordering)
+        self.max_wait       = max_wait
+
+        shape = (len(self.slow_positions), len(self.fast_positions))
+        self.data      = np.full(shape, np.nan)          # value of each pixel, filled in real time
+        self.positions = np.full(shape + (2,), np.nan)   # (slow, fast) encoder positions of each pixel
+        self.done      = 0                                # number of pixels done
+
+    def run(self):
+        """Run the scan, returns the (n_slow, n_fast) data array"""
+        return asyncio.run(self.run_async())
+
+    async def _move(self, axis, pos):
+        if not await self.stage.move_and_settle(self.stack_num, axis, pos, max_wait=self.max_wait):
+            raise TimeoutError(f'axis {axis} did not reach {pos} m')
+
+    async def _read_positions(self, loop):
+        return await asyncio.gather(
+            loop.run_in_executor(None, self.stage.get_axis_encoder_position, self.stack_num, self.slow_axis),
+            loop.run_in_executor(None, self.stage.get_axis_encoder_position, self.stack_num, self.fast_axis))
+
+    async def _finish_pixel(self, loop, s, f, raw):
+        value = raw
+        if self.readout is not None:
+            value = await loop.run_in_executor(None, self.readout, raw)
+        self.data[s, f] = value
+        self.done += 1
+        if self.on_pixel is not None:
+            self.on_pixel(s, f, value)
+
+    async def run_async(self):
+        """Awaitable version of run()"""
+        loop = asyncio.get_running_loop()
+        pending = []
+        current = (None, None)
+        try:
+            for (s, f) in self.pixels:
+                # Move the axes that change, concurrently, while the
+                # readout of the previous pixel is running
+                moves = []
+                if current[0] != s: moves.append(self._move(self.slow_axis, self.slow_positions[s]))
+                if current[1] != f: moves.append(self._move(self.fast_axis, self.fast_positions[f]))
+                await asyncio.gather(*moves)
+                current = (s, f)
+
+                (slow_pos, fast_pos) = await self._read_positions(loop)
+                self.positions[s, f] = (slow_pos, fast_pos)
+
+                raw = await loop.run_in_executor(None, self.measure, s, f, slow_pos, fast_pos)
+                for p in [p for p in pending if p.done()]:
+                    p.result()   # raise any readout error
+                    pending.remove(p)
+                pending.append(asyncio.ensure_future(self._finish_pixel(loop, s, f, raw)))
+        finally:
+            await asyncio.gather(*pending)
+        return self.data
@@ -4,8 +4,10 @@
 import sys
 import os
 import instrument
+import motion
 import time
 import datetime
+import asyncio
 
 class Rook(instrument.Instrument):
     def __init__(self, ip, version='v1', verbose=False, tunnel=False):
@@ -14,6 +16,7 @@ class Rook(instrument.Instrument):
                          version=version,
                          verbose=verbose,
                          tunnel=tunnel)
+        self._velocity = {}   # last velocity set on each (stack, axis)
 
     #
     # Controller commands
@@ -42,31 +45,87 @@ class Rook(instrument.Instrument):
         '''Get the encoder position for the given axis.'''
         return self.get_axis_status(stack_num, axis_num)['encoderPosition']
 
-    def wait_for_axis_not_moving(self, stack_num, axis_num, max_wait=datetime.timedelta(seconds=30)):
+    def _axis_settled(self, stack_num, axis_num, target=None, start_time=None, start_delay=0.05):
+        """Return a function that tells if the axis finished its move.
+
+        Right after a move command the axis may not report moving yet.
+        If the target is known the axis is settled once the target
+        position has been taken and it stopped moving, otherwise a
+        'not moving' read is ignored until the axis was seen moving, or
+        until start_delay after start_time.
+        """
+        if start_time is None: start_time = time.monotonic()
+        seen_moving = False
+        def settled():
+            nonlocal seen_moving
+            status = self.get_axis_status(stack_num, axis_num)
+            if status['moving']:
+                seen_moving = True
+                return False
+            if target is not None:
+                return abs(status['targetPosition'] - target) <= 1e-9  # m
+            return seen_moving or time.monotonic() - start_time >= start_delay
+        return settled
+
+    def wait_for_axis_not_moving(self, stack_num, axis_num, max_wait=datetime.timedelta(seconds=30),
+                                 expected_time=None, target=None):
         """Returns True if the axis reached the target before timeout, False
-           if timeout occurred and axis was still moving."""
+           if timeout occurred and axis was still moving.
 
-        reached_target = False
-        start_time  = datetime.datetime.now()
-        while not reached_target:
-            # Delay to give time for last move command to begin and
-            # state to propogate through system
-            time.sleep(0.5)
+           The axis is polled adaptively (see motion.py): after
+           expected_time (s), if given, then with a sub-ms interval that
+           backs off, instead of a fixed delay per poll."""
 
-            reached_target = not self.get_axis_moving(stack_num, axis_num)
+        reached_target = motion.wait_until(self._axis_settled(stack_num, axis_num, target),
+                                           max_wait.total_seconds(),
+                                           expected_time)
+        if not reached_target:
+            self.stop_axis(stack_num, axis_num)
+            print(f'Timed out before reaching target, stopped axis {axis_num}.')
 
-            # Break if we've exceeded the max_wait
-            elapsed_time = datetime.datetime.now() - start_time
-            if not reached_target and elapsed_time > max_wait:
-                self.stop_axis(stack_num, axis_num)
-                print(f'Timed out before reaching target, stopped axis {axis_num}.')
-                break
+        return reached_target
 
+    def estimate_move_time(self, stack_num, axis_num, distance, velocity=None):
+        '''Estimate how long (s) it takes the axis to move by distance (m)'''
+        if velocity is None:
+            velocity = self.get_axis_velocity(stack_num, axis_num)
+        return abs(distance) / velocity if velocity else None
+
+    async def move_and_settle(self, stack_num, axis_num, pos, velocity=None,
+                              max_wait=datetime.timedelta(seconds=30)):
+        """Move the axis to an absolute position and wait until it settled.
+
+        Awaitable, so that other tasks (e.g. reading another instrument)
+        run during the move.  Returns True if the axis reached the
+        target before timeout.
+        """
+        loop = asyncio.get_running_loop()
+        start = await loop.run_in_executor(None, self.get_axis_encoder_position, stack_num, axis_num)
+        await loop.run_in_executor(None, self.move_axis_absolute_position, stack_num, axis_num, pos)
+        if velocity is None:
+            velocity = self._velocity.get((stack_num, axis_num))
+        if velocity is None:
+            velocity = await loop.run_in_executor(None, self.get_axis_velocity, stack_num, axis_num)
+
+        reached_target = await motion.wait_until_async(self._axis_settled(stack_num, axis_num, pos),
+                                                       max_wait.total_seconds(),
+                                                       self.estimate_move_time(stack_num, axis_num, pos - start, velocity))
+        if not reached_target:
+            await loop.run_in_executor(None, self.stop_axis, stack_num, axis_num)
+            print(f'Timed out before reaching target, stopped axis {axis_num}.')
         return reached_target
 
+    def get_axis_velocity(self, stack_num, axis_num):
+        '''Get the target velocity of the given axis'''
+        if (stack_num, axis_num) not in self._velocity:
+            r = self.get_prop(f'stacks/stack{stack_num}/axes/axis{axis_num}/properties/velocity')
+            self._velocity[(stack_num, axis_num)] = r['velocity']
+        return self._velocity[(stack_num, axis_num)]
+
     def set_axis_velocity(self, stack_num, axis_num, velocity):
         '''Set the target velocity of the given axis'''
         self.set_prop(f'stacks/stack{stack_num}/axes/axis{axis_num}/properties/velocity', velocity)
+        self._velocity[(stack_num, axis_num)] = velocity
         return
 
     def move_axis_to_negative_limit(self, stack_num, axis_num):
@@ -132,8 +191,11 @@ if __name__ == "__main__":
 
     for p in [0, 100, 200, 300, 400, 500, 0]: # um
         print(f'Move absolute to {p}')
+        start = rook.get_axis_encoder_position(stack_num, axis_num)
         rook.move_axis_absolute_position(stack_num, axis_num, p/1000/1000)
-        if rook.wait_for_axis_not_moving(stack_num, axis_num):
+        if rook.wait_for_axis_not_moving(stack_num, axis_num,
+                                         expected_time = rook.estimate_move_time(stack_num, axis_num, p/1000/1000 - start),
+                                         target        = p/1000/1000):
             print('Target acquired.')
         else:
             print('Failed to acquire target before timeout occurred.')
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""Fixed-memory store of telemetry (e.g. temperatures and heater powers)
+
+Recent samples are kept at full rate in a ring buffer.  Older data is
+kept as a multi-resolution history: each level holds min/max bins
+that are `decimation` times longer than the bins of the level below.
+Memory and the cost of reading a window are fixed, no matter how long
+the logging has been running.
+
+Example usage:
+  store = telemetry.TelemetryStore(n_channels=2)
+  store.append(time.time(), [3.1, 0.05])
+  t, y = store.envelope(span=24*3600, max_points=2000)   # last day, for plotting
+"""
+
+import numpy as np
+
+
+class _Ring:
+    """Ring buffer of bins, each with a time and min/max per channel"""
+    def __init__(self, capacity, n_channels):
+        self.capacity = capacity
+        self.t        = np.zeros(capacity)
+        self.vmin     = np.zeros((capacity, n_channels))
+        self.vmax     = np.zeros((capacity, n_channels))
+        self.count    = 0
+
+    def append(self, t, vmin, vmax):
+        i = self.count % self.capacity
+        self.t[i]    = t
+        self.vmin[i] = vmin
+        self.vmax[i] = vmax
+        self.count  += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _segments(self):
+        """Slices of the buffer in time order (two slices once it has wrapped)"""
+        n     = len(self)
+        start = (self.count - n) % self.capacity
+        if start + n <= self.capacity:
+            return [slice(start, start + n)]
+        return [slice(start, self.capacity), slice(0, start + n - self.capacity)]
+
+    def oldest(self):
+        return self.t[self._segments()[0].start] if len(self) else np.inf
+
+    def count_since(self, t0):
+        """Number of bins with a time >= t0, without copying"""
+        return sum(s.stop - s.start - np.searchsorted(self.t[s], t0) for s in self._segments())
+
+    def last(self, n):
+        """The last n bins, in time order"""
+        idx = (self.count - min(n, len(self)) + np.arange(min(n, len(self)))) % self.capacity
+        return self.t[idx], self.vmin[idx], self.vmax[idx]
+
+
+class _Accumulator:
+    """A bin that is being filled"""
+    def __init__(self, n_channels):
+        self.n_channels = n_channels
+        self.clear()
+
+    def clear(self):
+        self.n       = 0
+        self.t_first = None
+        self.t_last  = None
+        # NaN, so that fmin/fmax return the first value added
+        self.vmin    = np.full(self.n_channels, np.nan)
+        self.vmax    = np.full(self.n_channels, np.nan)
+
+    def add(self, t_first, t_last, vmin, vmax):
+        if self.n == 0: self.t_first = t_first
+        self.t_last = t_last
+        np.fmin(self.vmin, vmin, out=self.vmin)
+        np.fmax(self.vmax, vmax, out=self.vmax)
+        self.n += 1
+
+    def t(self):
+        return 0.5 * (self.t_first + self.t_last)
+
+
+class TelemetryStore:
+    def __init__(self, n_channels, capacity=100000, decimation=10, levels=4, level_capacity=10000):
+        """
+        Keyword Parameters:
+           n_channels       Number of values in each sample
+           capacity         Number of samples kept at full rate
+           decimation       Number of bins of a level combined into one
+                            bin of the next level
+           levels           Number of history levels, the bins of level k
+                            span decimation**(k+1) samples
+           level_capacity   Number of bins kept in each level
+        """
+        self.n_channels     = n_channels
+        self.capacity       = capacity
+        self.decimation     = decimation
+        self.n_levels       = levels
+        self.level_capacity = level_capacity
+        self.clear()
+
+    def clear(self):
+        self.recent = _Ring(self.capacity, self.n_channels)
+        self.levels = [_Ring(self.level_capacity, self.n_channels) for k in range(self.n_levels)]
+        self.acc    = [_Accumulator(self.n_channels) for k in range(self.n_levels)]
+
+    def __len__(self):
+        """Total number of samples appended"""
+        return self.recent.count
+
+    def append(self, t, values):
+        """Add a sample, values has one value per channel (NaN if missing)"""
+        values = np.asarray(values, dtype=np.float64)
+        self.recent.append(t, values, values)
+
+        # Feed the sample up through the levels, a level only gets a
+        # new bin when the level below has completed `decimation` bins.
+        (t_first, t_last, vmin, vmax) = (t, t, values, values)
+        for level, acc in zip(self.levels, self.acc):
+            acc.add(t_first, t_last, vmin, vmax)
+            if acc.n < self.decimation: break
+            (t_first, t_last, vmin, vmax) = (acc.t_first, acc.t_last, acc.vmin.copy(), acc.vmax.copy())
+            level.append(acc.t(), vmin, vmax)
+            acc.clear()
+
+    def window(self, span=None, max_points=2000):
+        """Return the data of the last span seconds, with at most about max_points bins
+
+        The finest resolution that covers the span with max_points
+        bins is used.  Bins still being filled are added at the end, so
+        the window always reaches the last sample.
+
+        Keyword Parameters:
+           span         Time span in seconds, everything if None
+           max_points   Maximum number of bins returned
+
+        Return
+           (t, ymin, ymax) with shapes (n,), (n, n_channels), (n, n_channels).
+           For full rate data ymin and ymax are the same.
+        """
+        if self.recent.count == 0:
+            empty = np.zeros((0, self.n_channels))
+            return np.zeros(0), empty, empty
+
+        t_end = self.recent.t[(self.recent.count - 1) % self.capacity]
+        t0    = -np.inf if span is None else t_end - span
+
+        # Full rate data, if the ring buffer reaches back far enough
+        if self.recent.oldest() <= t0 or self.recent.count <= self.capacity:
+            n = self.recent.count_since(t0)
+            if n <= max_points:
+                return self.recent.last(n)
+
+        # Otherwise the finest level that fits
+        for k, level in enumerate(self.levels):
+            covers = level.oldest() <= t0 or level.count <= self.level_capacity
+            n      = level.count_since(t0)
+            if (covers and n <= max_points) or k == self.n_levels - 1:
+                (t, vmin, vmax) = level.last(min(n, max_points))
+                partial = [acc for acc in reversed(self.acc[:k+1]) if acc.n > 0]
+                if partial:
+                    t    = np.concatenate([t,    [acc.t() for acc in partial]])
+                    vmin = np.concatenate([vmin, [acc.vmin for acc in partial]])
+                    vmax = np.concatenate([vmax, [acc.vmax for acc in partial]])
+                return t, vmin, vmax
+
+    def envelope(self, span=None, max_points=2000):
+        """Like window(), but as a single line per channel for plotting
+
+        Each bin is drawn as a vertical segment from its min to its max,
+        so spikes stay visible however long the span is.
+
+        Return
+           (t, y) with shapes (m,), (m, n_channels)
+        """
+        (t, vmin, vmax) = self.window(span, max(max_points // 2, 1))
+        if np.array_equal(vmin, vmax, equal_nan=True):
+            return t, vmin
+        y        = np.empty((2 * len(t), self.n_channels))
+        y[0::2]  = vmin
+        y[1::2]  = vmax
+        return np.repeat(t, 2), y
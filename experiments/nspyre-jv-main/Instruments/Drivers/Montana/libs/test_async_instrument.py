@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+#
+# Tests of async_instrument.AsyncInstrument and
+# async_genericcryostat.AsyncGenericCryostat against a stub REST server
+# on localhost, run with:
+#   python -m pytest test_async_instrument.py
+#
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import http.server
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+pytest.importorskip('httpx')
+pytest.importorskip('sshtunnel')
+
+import async_instrument
+import async_genericcryostat
+
+# Every request to the stub takes this long, so calls that run one
+# after the other take n*delay, and concurrent ones about delay.
+delay = 0.2
+n_calls = 4
+
+CHANNELS = [('sampleChamber', 'platform'), ('cooler', 'stage1'), ('cooler', 'stage2'), ('magnet', 'magnet')]
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None):
+        self.server.enter()
+        try:
+            time.sleep(delay)
+        finally:
+            self.server.leave()
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        n = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(n)) if n else None
+
+    def do_GET(self):
+        host = f'http://{self.server.server_address[0]}:{self.server.server_address[1]}'
+        if self.path.rstrip('/') == '/v1':
+            self.reply(200, [f'{host}/v1/{loc}/temperatureControllers/{ch}/thermometer/properties/sample'
+                             for (loc, ch) in CHANNELS] + [f'{host}/v1/controller/properties/state'])
+        elif self.path.endswith('/thermometer/properties/sample'):
+            self.reply(200, {'sample': {'temperature': 4.0, 'path': self.path}})
+        else:
+            self.reply(404, {'title': 'Not Found', 'detail': self.path})
+
+    def do_PUT(self):
+        self.reply(200, self.read_body())
+
+    def do_POST(self):
+        self.read_body()
+        self.reply(200)
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+@pytest.fixture
+def server():
+    srv = StubServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def run_timed(server, make_calls, cls=async_instrument.AsyncInstrument):
+    """Run the coroutines from make_calls(inst) together, return the results and elapsed time"""
+    async def main():
+        async with cls('127.0.0.1', server.server_address[1], 'v1') as inst:
+            start = time.perf_counter()
+            result = await asyncio.gather(*make_calls(inst))
+            return result, time.perf_counter() - start
+    return asyncio.run(main())
+
+
+def sample_path(ch):
+    return f'/{ch[0]}/temperatureControllers/{ch[1]}/thermometer/properties/sample'
+
+
+def test_gather_props_concurrent(server):
+    (result,), elapsed = run_timed(server, lambda inst: [inst.gather_props([sample_path(ch) for ch in CHANNELS])])
+    assert [r['sample']['path'] for r in result] == ['/v1' + sample_path(ch) for ch in CHANNELS]
+    assert server.max_active == n_calls
+    assert elapsed < 2*delay
+
+
+def test_get_set_call_concurrent(server):
+    def calls(inst):
+        return [inst.get_prop(sample_path(CHANNELS[0])),
+                inst.set_prop('/sampleChamber/temperatureControllers/platform/properties/onOffPower', {'onOffPower': 1.5}),
+                inst.call_method('/controller/methods/cooldown()'),
+                inst.call_method('/controller/methods/setValue(double:value)', {'value': 2})]
+    (sample, put, post, post_data), elapsed = run_timed(server, calls)
+    assert sample['sample']['temperature'] == 4.0
+    assert put == {'onOffPower': 1.5}
+    assert post is None and post_data is None
+    assert server.max_active == n_calls
+    assert elapsed < 2*delay
+
+
+def test_api_error(server):
+    with pytest.raises(async_instrument.ApiError):
+        run_timed(server, lambda inst: [inst.get_prop('/does/not/exist')])
+
+
+def test_cryostat_thermometers(server):
+    def calls(inst):
+        async def read():
+            channels = await inst.cryo_thermometer_channels()
+            return channels, await inst.get_thermometer_samples(channels)
+        return [read()]
+    ((channels, samples),), elapsed = run_timed(server, calls, async_genericcryostat.AsyncGenericCryostat)
+    assert sorted(channels) == sorted(CHANNELS)
+    assert set(samples) == set(CHANNELS)
+    # one GET of the tree, then all the samples at once
+    assert elapsed < 3*delay
@@ -19,10 +19,9 @@ def _do_experiment(slow_pixel, fast_pixel, slow_pos, fast_pos):
     time.sleep(5)
 
 def _wait_for_axis_not_busy(stack_number, axis_number):
-    axis_moving = True
-    while axis_moving:
-        time.sleep(0.1)
-        axis_moving = positioner.get_prop(f'stack{stack_number}/axes/axis{axis_number}/properties/busy')['busy']
+    # Poll adaptively from the expected step time instead of every 100 ms
+    positioner.wait_for_axis_not_busy(stack_number, axis_number,
+                                      expected_time = positioner.estimate_step_time(stack_number, axis_number))
     return
 
 if __name__ == "__main__":
@@ -55,8 +54,8 @@ if __name__ == "__main__":
 
     try:
         # Set the step size to use for each axis
-        positioner.set_prop(f'stack{stack_number}/axes/axis{axis_fast}/properties/numberOfSteps', args.fast_numsteps)
-        positioner.set_prop(f'stack{stack_number}/axes/axis{axis_slow}/properties/numberOfSteps', args.slow_numsteps)
+        positioner.set_axis_number_of_steps(stack_number, axis_fast, args.fast_numsteps)
+        positioner.set_axis_number_of_steps(stack_number, axis_slow, args.slow_numsteps)
 
         for s in range(0, args.slow_pixels):
             if s != 0:
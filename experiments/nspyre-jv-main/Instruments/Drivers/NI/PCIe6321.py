@@ -1,11 +1,15 @@
 import numpy as np
 import time
+import os
+import sys
 import nidaqmx
 from nidaqmx.constants import (AcquisitionType, CountDirection, Edge, READ_ALL_AVAILABLE, TaskMode, TriggerType)
-from nidaqmx.stream_readers import CounterReader
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from daq_stream import StreamingMixin
 
 # acquire counts from NI DAQ
-class DAQ():
+class DAQ(StreamingMixin):
 
     def __init__(self):
         self.dev_name = 'Dev1'
@@ -17,6 +21,13 @@ class DAQ():
             1 : {'ctr_name':'ctr1', 'pfi_name':'PFI12', 'port_name':'port0'},
             }
         self.last_v = []
+        self.ao_v = {} # last voltage set on each ao channel
+        self.read_tasks = []
+        self.samp_clk_task = None
+        self.read_buf = None # flat raw buffer of read_counters
+
+        # continuous acquisition into a ring buffer, see daq_stream.StreamingMixin
+        self.init_streaming()
 
         # channel off which the DAQ triggers
         self.trigger_source = 'SampleClock' # supported: SampleClock
@@ -76,58 +87,28 @@ class DAQ():
             clk_src = []
             print('DAQ error: specify a supported trigger source.')
 
-        # set up read channels and stream readers for all channels
-        self.read_tasks = []
-        self.readers = []
-        self.n_chan = 0
-
-        # read channels
-        for ch_idx, key in enumerate(self.channels):
-            dev_channel = self.dev_name + '/' + self.channels[key]['ctr_name'] #channel
-
-            # set up read task counter channel
-            self.read_tasks.append(nidaqmx.Task())
-            self.read_tasks[ch_idx].ci_channels.add_ci_count_edges_chan(
-                                    dev_channel,
-                                    edge=Edge.RISING,
-                                    initial_count=0,
-                                    count_direction=CountDirection.COUNT_UP
-            )
-
-            # this is superfluous if the PFI channels are the default options
-            pfi_channel = '/' + self.dev_name + '/' + self.channels[key]['pfi_name']
-            self.read_tasks[ch_idx].ci_channels.all.ci_count_edges_term = pfi_channel
-
-            # set up read_task timing and triggering off the sample clock
-            self.read_tasks[ch_idx].timing.cfg_samp_clk_timing(
-                                    self.sampling_rate,
-                                    source=clk_src,
-                                    sample_mode=AcquisitionType.CONTINUOUS
-            )
-            self.read_tasks[ch_idx].in_stream.input_buf_size = self.buffer_size
+        # set up one read task with all counter channels, so that all channels are read together in one call
+        self.read_task = self.create_counter_task(self.sampling_rate, clk_src, AcquisitionType.CONTINUOUS)
+        self.read_task.in_stream.input_buf_size = self.buffer_size
 
-            # set trigger mode
-            # print('DAQ test...')
-            # print(self.read_tasks[ch_idx].triggers.arm_start_trigger)
-            # print(self.read_tasks[ch_idx].triggers.arm_start_trigger.__dict__)
-
-            if self.trigger_source == 'SampleClock':
-                self.read_tasks[ch_idx].triggers.arm_start_trigger.trig_type = TriggerType.DIGITAL_EDGE
-                self.read_tasks[ch_idx].triggers.arm_start_trigger.dig_edge_edge = Edge.RISING
-                self.read_tasks[ch_idx].triggers.arm_start_trigger.dig_edge_src = clk_src
+        # set trigger mode
+        if self.trigger_source == 'SampleClock':
+            self.read_task.triggers.arm_start_trigger.trig_type = TriggerType.DIGITAL_EDGE
+            self.read_task.triggers.arm_start_trigger.dig_edge_edge = Edge.RISING
+            self.read_task.triggers.arm_start_trigger.dig_edge_src = clk_src
 
-            elif self.trigger_source == 'test':
-                # self.read_tasks[ch_idx].triggers.start_trigger.trig_type = TriggerType.ANALOG_EDGE
-                # self.read_tasks[ch_idx].triggers.start_trigger.anlg_edge_lvl = 1
-                # self.read_tasks[ch_idx].triggers.start_trigger.anlg_edge_slope = Edge.RISING
-                self.read_tasks[ch_idx].triggers.start_trigger.anlg_edge_src = clk_src
+        elif self.trigger_source == 'test':
+            # self.read_task.triggers.start_trigger.trig_type = TriggerType.ANALOG_EDGE
+            # self.read_task.triggers.start_trigger.anlg_edge_lvl = 1
+            # self.read_task.triggers.start_trigger.anlg_edge_slope = Edge.RISING
+            self.read_task.triggers.start_trigger.anlg_edge_src = clk_src
 
-            self.readers.append(CounterReader(self.read_tasks[ch_idx].in_stream))
-            self.read_tasks[ch_idx].start()
+        self.read_task.start()
+        self.read_tasks = [self.read_task]
 
-        # set up data array to dump read buffer into
-        self.data_array = np.zeros((self.buffer_size), dtype=np.uint32)
+        # set up data array to dump read buffer into, one row per channel
         self.n_chan = self.channels.__len__()
+        self.data_array = np.zeros((self.n_chan, self.buffer_size), dtype=np.uint32)
 
         print('...........................')
         print('DAQ parameters:')
@@ -136,57 +117,201 @@ class DAQ():
         print('buffer_size: ' + str(self.buffer_size))
         print('...........................')
 
+    def create_counter_task(self, rate, clk_src, sample_mode, samps_per_chan=1000):
+        # one task with a count edges channel for every channel in self.channels, sampled on clk_src
+        task = nidaqmx.Task()
+        for key in self.channels:
+            ci_channel = task.ci_channels.add_ci_count_edges_chan(
+                                    self.dev_name + '/' + self.channels[key]['ctr_name'],
+                                    edge=Edge.RISING,
+                                    initial_count=0,
+                                    count_direction=CountDirection.COUNT_UP
+            )
+            # this is superfluous if the PFI channels are the default options
+            ci_channel.ci_count_edges_term = '/' + self.dev_name + '/' + self.channels[key]['pfi_name']
+
+        task.timing.cfg_samp_clk_timing(
+                                rate,
+                                source=clk_src,
+                                sample_mode=sample_mode,
+                                samps_per_chan=samps_per_chan
+        )
+        return task
+
+    def read_counters(self, task, data, timeout=10):
+        # read all counter channels of a task into data, shape (n_chan, n_samps), in one call
+        # the raw buffer is interleaved (grouped by scan number: ch0, ch1, ch0, ch1, ...),
+        #   so it is read into a flat buffer and de-interleaved into the rows of data
+        n_chan, n_samps = data.shape
+        task.in_stream.timeout = timeout
+        if n_chan == 1:
+            task.in_stream.readinto(data[0])
+            return n_samps
+        if self.read_buf is None or self.read_buf.size != data.size or self.read_buf.dtype != data.dtype:
+            self.read_buf = np.zeros(data.size, dtype=data.dtype)
+        task.in_stream.readinto(self.read_buf)
+        data[:] = self.read_buf.reshape(n_samps, n_chan).T
+        return n_samps
+
     def finalize(self):
+        self.stop_streaming()
         for idx, read_task in enumerate(self.read_tasks):
             # self.read_tasks[idx].stop()
             self.read_tasks[idx].close()
-        self.samp_clk_task.close()
+        self.read_tasks = []
+        if self.samp_clk_task is not None:
+            self.samp_clk_task.close()
+            self.samp_clk_task = None
 
     def read(self):
+        # while streaming, the next time_per_point window is taken from the ring buffer, without any task setup
+        if self.streaming:
+            return self.read_stream(self.time_per_point)
+
+        # point-by-point tasks are closed by scan_ao, reopen them if needed
+        if not self.read_tasks:
+            self.initialize()
+
         self.samp_clk_task.start()
-        d_ctrs = np.zeros(self.n_chan)
 
-        for ch_idx, reader in enumerate(self.readers):
-            num_samps = self.readers[ch_idx].read_many_sample_uint32(
-                    self.data_array,
-                    number_of_samples_per_channel=self.buffer_size
-            )
-            d_ctrs[ch_idx] = self.data_array[-1] - self.data_array[0]
+        # all channels in one read, rates computed for all channels at once
+        # uint32 differences are correct across a counter rollover
+        self.read_counters(self.read_task, self.data_array)
+        d_ctrs = (self.data_array[:, -1] - self.data_array[:, 0]).astype(np.float64)
 
         ctrs_rate = d_ctrs / self.real_point_time
 
         self.samp_clk_task.stop()
         return ctrs_rate
 
+    def stream_initialize(self):
+        if not self.read_tasks:
+            self.initialize()
+
+    def stream_setup(self):
+        # the device buffer must hold several chunks, so that samples aren't overwritten between reads
+        for read_task in self.read_tasks:
+            read_task.stop()
+            read_task.in_stream.input_buf_size = max(self.buffer_size, 10 * self.chunk_size)
+            read_task.start()
+        self.samp_clk_task.start()
+
+    def stream_teardown(self):
+        self.samp_clk_task.stop()
+
+    def read_chunk(self, chunk, timeout):
+        self.read_counters(self.read_task, chunk, timeout=timeout)
+
     def set_ao_voltage(self, v, ch=0):
         ch_name = self.dev_name + '/' + 'ao' + str(ch)
         with nidaqmx.Task() as task:
             task.ao_channels.add_ao_voltage_chan(ch_name, max_val=5, min_val=-5)
             samples_written = task.write(v)
             self.last_v = v
+            self.ao_v[ch] = v
             if samples_written != 1:
                 print('DAQ warning: number of written samples = ' + str(samples_written))
 
         # print('setting ' + str(ch_name) + ' to: ' + str(v) + ' V')
 
     def set_ao_voltage_ramp(self, v, ch=0, dv=0.01, time_per_step=1e-3):
-
-        if self.last_v == []:
-            print('warning: no current voltage specified, setting voltage to ' + str(v) + ' V without ramp')
-            self.set_ao_voltage(v, ch)
-            self.last_v = v
+        # ramp in steps of at most dv, written as one sample-clocked waveform at 1/time_per_step samples/s
+        # v and ch can also be lists, to ramp several ao channels at the same time, all channels arrive together
+        v_list = [float(v_val) for v_val in np.atleast_1d(v)]
+        ch_list = [int(ch_val) for ch_val in np.atleast_1d(ch)]
+        if len(v_list) != len(ch_list):
+            raise ValueError('DAQ error: ' + str(len(v_list)) + ' voltages given for ' + str(len(ch_list)) + ' channels.')
+
+        # start from the last voltage set on each channel
+        v_start = []
+        for v_val, ch_val in zip(v_list, ch_list):
+            last_v = self.ao_v.get(ch_val, self.last_v)
+            if last_v == []:
+                print('warning: no current voltage specified, setting voltage to ' + str(v_val) + ' V without ramp')
+                last_v = v_val
+            v_start.append(float(last_v))
+
+        # all channels use the same number of steps, set by the channel with the largest change
+        n_steps = int(np.ceil(np.max(np.abs(np.array(v_list) - np.array(v_start))) / dv - 1e-9))
+        if n_steps <= 1:
+            for v_val, ch_val in zip(v_list, ch_list):
+                self.set_ao_voltage(v_val, ch_val)
             return
 
-        if v != self.last_v:
-            if self.last_v < v:
-                v_vec = np.arange(self.last_v, v+dv, dv)
-            elif self.last_v >= v:
-                v_vec = np.arange(self.last_v, v-dv, -dv)
-            for v_idx, v_val in enumerate(v_vec):
-                self.set_ao_voltage(v_val, ch)
-                time.sleep(time_per_step)
-        else:
-            self.set_ao_voltage(v, ch)
+        # waveform, one row per channel, the first step is dv away from the current voltage
+        waveform = np.linspace(v_start, v_list, n_steps + 1, axis=1)[:, 1:]
+        timeout = n_steps * time_per_step + 10
+
+        with nidaqmx.Task() as task:
+            for ch_val in ch_list:
+                task.ao_channels.add_ao_voltage_chan(self.dev_name + '/' + 'ao' + str(ch_val), max_val=5, min_val=-5)
+            task.timing.cfg_samp_clk_timing(
+                                    1 / time_per_step,
+                                    sample_mode=AcquisitionType.FINITE,
+                                    samps_per_chan=n_steps
+            )
+            if len(ch_list) == 1:
+                samples_written = task.write(waveform[0], auto_start=False)
+            else:
+                samples_written = task.write(waveform, auto_start=False)
+            task.start()
+            task.wait_until_done(timeout=timeout)
+            if samples_written != n_steps:
+                print('DAQ warning: number of written samples = ' + str(samples_written))
+
+        for v_val, ch_val in zip(v_list, ch_list):
+            self.ao_v[ch_val] = v_val
+        self.last_v = v_list[-1]
+
+    def scan_ao(self, v_vec, ch=0, time_per_point=None):
+        # hardware-timed buffered scan: ao<ch> steps through v_vec on its own sample clock,
+        # and all counter channels sample on the same clock, so a line of N points costs one task start instead of N
+        # returns count rates with shape (n_chan, len(v_vec))
+        # the counters can't be shared with the point-by-point tasks, so these are closed, and reopened by the next read()
+        v_vec = np.asarray(v_vec, dtype=np.float64)
+        if time_per_point is None:
+            time_per_point = self.time_per_point
+        rate = 1 / time_per_point
+        n_points = len(v_vec)
+        timeout = n_points * time_per_point + 10
+
+        self.finalize()
+
+        # one extra sample, the counts at point i are the difference between counter samples i+1 and i
+        n_samps = n_points + 1
+        ao_data = np.append(v_vec, v_vec[-1])
+        ao_clk_src = '/' + self.dev_name + '/ao/SampleClock'
+        data = np.zeros((len(self.channels), n_samps), dtype=np.uint32)
+
+        ao_task = nidaqmx.Task()
+        ctr_task = None
+        try:
+            ao_task.ao_channels.add_ao_voltage_chan(self.dev_name + '/' + 'ao' + str(ch), max_val=5, min_val=-5)
+            ao_task.timing.cfg_samp_clk_timing(
+                                    rate,
+                                    sample_mode=AcquisitionType.FINITE,
+                                    samps_per_chan=n_samps
+            )
+
+            # counters are armed first, and latch on every tick of the ao sample clock
+            ctr_task = self.create_counter_task(rate, ao_clk_src, AcquisitionType.FINITE, samps_per_chan=n_samps)
+            ctr_task.start()
+
+            ao_task.write(ao_data, auto_start=False)
+            ao_task.start()
+
+            self.read_counters(ctr_task, data, timeout=timeout)
+            ao_task.wait_until_done(timeout=timeout)
+        finally:
+            if ctr_task is not None:
+                ctr_task.close()
+            ao_task.close()
+
+        self.last_v = self.ao_v[ch] = float(v_vec[-1])
+
+        # uint32 differences are correct across a counter rollover
+        d_ctrs = np.diff(data, axis=1)
+        return d_ctrs / time_per_point
 
     def read_ai_voltage(self, ch=0):
         ch_name = self.dev_name + '/' + 'ai' + str(ch)
@@ -0,0 +1,157 @@
+import numpy as np
+import time
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from daq_stream import StreamingMixin
+
+# simulated NI DAQ, with the same interface as PCIe6321.DAQ but without nidaqmx
+# used to benchmark the throughput of sweeps, the data server and plotting on any computer
+#   counts are Poisson distributed, with a mean rate (counts/s) per channel set in self.count_rates
+#   latencies (s) model the time the real DAQ spends on task setup and data transfer
+#   with real_time = False, reads return without waiting for the acquisition time, to benchmark only the software
+#   streaming is the same as the real DAQ (daq_stream.StreamingMixin), only the source of the samples differs
+class DAQ(StreamingMixin):
+
+    def __init__(self):
+        self.dev_name = 'SimDev1'
+        self.sampling_rate = 100
+        self.buffer_size = 12000
+        self.time_per_point = 0.1
+        self.channels = {
+            0 : {'ctr_name':'ctr0', 'pfi_name':'PFI0', 'port_name':'port0'},
+            1 : {'ctr_name':'ctr1', 'pfi_name':'PFI12', 'port_name':'port0'},
+            }
+        self.last_v = []
+
+        # simulation parameters
+        self.count_rates = {0: 1e4, 1: 5e3}
+        self.task_latency = 2e-3 # start/stop of a task
+        self.ao_latency = 1e-3 # creating a task and writing a single ao sample
+        self.ai_latency = 1e-3 # creating a task and reading a single ai sample
+        self.real_time = True
+        self.seed = None
+
+        self.rng = np.random.default_rng(self.seed)
+        self.ao_voltages = {}
+        self.initialized = False
+
+        # continuous acquisition into a ring buffer, see daq_stream.StreamingMixin
+        self.init_streaming()
+
+    def reset(self):
+        self.finalize()
+        print('DAQ reset.')
+
+    def initialize(self):
+        self.finalize()
+
+        # same buffer size as the real DAQ
+        points = round(self.sampling_rate * self.time_per_point)
+        if points < 2:
+            print('Warning: buffer size must be greater than 2.')
+            points = 2
+            self.sampling_rate = int(points/self.time_per_point)
+            print('Changing sampling rate to ' + str(self.sampling_rate) + ' so that buffer size = 2.')
+        self.buffer_size = int(points)
+        self.real_point_time = (points-1)/self.sampling_rate
+        self.n_chan = len(self.channels)
+        self.rng = np.random.default_rng(self.seed)
+        self.counters = np.zeros(self.n_chan, dtype=np.uint32)
+        self.initialized = True
+
+        print('...........................')
+        print('simulated DAQ parameters:')
+        print('dev_name: ' + str(self.dev_name))
+        print('sampling_rate: ' + str(self.sampling_rate))
+        print('buffer_size: ' + str(self.buffer_size))
+        print('...........................')
+
+    def finalize(self):
+        self.stop_streaming()
+        self.initialized = False
+
+    def wait(self, t):
+        if self.real_time and t > 0:
+            time.sleep(t)
+
+    def rates(self):
+        # mean count rate of each channel
+        return np.array([self.count_rates.get(key, 0) for key in self.channels], dtype=np.float64)
+
+    def generate_counts(self, n_samps, dt):
+        # cumulative counter values, shape (n_chan, n_samps), for samples every dt seconds
+        increments = self.rng.poisson(self.rates()[:, None] * dt, size=(self.n_chan, n_samps)).astype(np.uint32)
+        data = self.counters[:, None] + np.cumsum(increments, axis=1, dtype=np.uint32)
+        self.counters = data[:, -1].copy()
+        return data
+
+    def read(self):
+        if self.streaming:
+            return self.read_stream(self.time_per_point)
+        if not self.initialized:
+            self.initialize()
+
+        self.wait(self.task_latency)
+        data = self.generate_counts(self.buffer_size, 1/self.sampling_rate)
+        self.wait(self.buffer_size/self.sampling_rate)
+        d_ctrs = (data[:, -1] - data[:, 0]).astype(np.float64)
+        return d_ctrs / self.real_point_time
+
+    def scan_ao(self, v_vec, ch=0, time_per_point=None):
+        v_vec = np.asarray(v_vec, dtype=np.float64)
+        if time_per_point is None:
+            time_per_point = self.time_per_point
+        self.finalize()
+        if not hasattr(self, 'n_chan'):
+            self.n_chan = len(self.channels)
+            self.counters = np.zeros(self.n_chan, dtype=np.uint32)
+
+        self.wait(self.task_latency)
+        data = self.generate_counts(len(v_vec) + 1, time_per_point)
+        self.wait(len(v_vec) * time_per_point)
+        self.ao_voltages[ch] = self.last_v = float(v_vec[-1])
+        return np.diff(data, axis=1) / time_per_point
+
+    def stream_initialize(self):
+        if not self.initialized:
+            self.initialize()
+
+    def read_chunk(self, chunk, timeout):
+        # samples are generated at the sampling rate even with real_time = False, so that windows are meaningful
+        time.sleep(chunk.shape[1] / self.sampling_rate)
+        chunk[:] = self.generate_counts(chunk.shape[1], 1/self.sampling_rate)
+
+    def set_ao_voltage(self, v, ch=0):
+        self.wait(self.ao_latency)
+        self.ao_voltages[ch] = v
+        self.last_v = v
+
+    def set_ao_voltage_ramp(self, v, ch=0, dv=0.01, time_per_step=1e-3):
+        v_list = [float(v_val) for v_val in np.atleast_1d(v)]
+        ch_list = [int(ch_val) for ch_val in np.atleast_1d(ch)]
+        if len(v_list) != len(ch_list):
+            raise ValueError('DAQ error: ' + str(len(v_list)) + ' voltages given for ' + str(len(ch_list)) + ' channels.')
+
+        v_start = []
+        for v_val, ch_val in zip(v_list, ch_list):
+            last_v = self.ao_voltages.get(ch_val, self.last_v)
+            if last_v == []:
+                print('warning: no current voltage specified, setting voltage to ' + str(v_val) + ' V without ramp')
+                last_v = v_val
+            v_start.append(float(last_v))
+
+        # same timing as the real DAQ, one task with a sample-clocked waveform
+        n_steps = int(np.ceil(np.max(np.abs(np.array(v_list) - np.array(v_start))) / dv - 1e-9))
+        if n_steps <= 1:
+            self.wait(len(ch_list) * self.ao_latency)
+        else:
+            self.wait(self.task_latency + n_steps * time_per_step)
+        for v_val, ch_val in zip(v_list, ch_list):
+            self.ao_voltages[ch_val] = v_val
+        self.last_v = v_list[-1]
+
+    def read_ai_voltage(self, ch=0):
+        self.wait(self.ai_latency)
+        return self.ao_voltages.get(ch, 0.0) + self.rng.normal(0, 1e-3)
@@ -0,0 +1,129 @@
+import numpy as np
+import threading
+
+# continuous acquisition of the counters into a ring buffer, shared by PCIe6321.DAQ and PCIe6321_sim.DAQ
+#   a background thread fills the ring buffer with the raw (cumulative) counter values, one row per channel,
+#   so the count rate over any window up to buffer_time can be computed on demand
+#   the DAQ class only provides the source of the samples:
+#       stream_initialize(): make sure the DAQ is initialized (sampling_rate, n_chan)
+#       stream_setup(): called after the ring buffer is allocated, before the thread starts
+#       stream_teardown(): called after the thread has stopped
+#       read_chunk(chunk, timeout): fill chunk, shape (n_chan, chunk_size), with the next samples
+class StreamingMixin():
+
+    def init_streaming(self):
+        self.streaming = False
+        self.stream_thread = None
+        self.ring = None
+        self.ring_count = 0
+        self.ring_cond = threading.Condition()
+
+    def stream_setup(self):
+        pass
+
+    def stream_teardown(self):
+        pass
+
+    def start_streaming(self, buffer_time=60, chunk_time=0.05):
+        # continuously acquire all counter channels in a background thread, into a ring buffer of buffer_time (s)
+        if self.stream_thread is not None:
+            return
+        self.stream_initialize()
+
+        ring_size = max(int(self.sampling_rate * buffer_time), 2)
+        self.chunk_size = max(int(self.sampling_rate * chunk_time), 1)
+        self.ring = np.zeros((self.n_chan, ring_size), dtype=np.uint32)
+        self.ring_count = 0
+        self.stream_chunk = np.zeros((self.n_chan, self.chunk_size), dtype=np.uint32)
+        self.stream_setup()
+
+        self.streaming = True
+        self.stream_thread = threading.Thread(target=self.stream_loop, daemon=True)
+        self.stream_thread.start()
+
+    def stop_streaming(self):
+        if self.stream_thread is None:
+            return
+        self.streaming = False
+        self.stream_thread.join()
+        self.stream_thread = None
+        self.stream_teardown()
+        with self.ring_cond:
+            self.ring_cond.notify_all()
+
+    def stream_loop(self):
+        # drain the counters into the ring buffer
+        ring_size = self.ring.shape[1]
+        timeout = 10 * self.chunk_size / self.sampling_rate + 1
+        while self.streaming:
+            try:
+                self.read_chunk(self.stream_chunk, timeout)
+            except Exception as exc:
+                print('DAQ error: streaming stopped, ' + str(exc))
+                self.streaming = False
+                with self.ring_cond:
+                    self.ring_cond.notify_all()
+                return
+            with self.ring_cond:
+                start = self.ring_count % ring_size
+                stop = start + self.chunk_size
+                if stop <= ring_size:
+                    self.ring[:, start:stop] = self.stream_chunk
+                else:
+                    split = ring_size - start
+                    self.ring[:, start:] = self.stream_chunk[:, :split]
+                    self.ring[:, :stop - ring_size] = self.stream_chunk[:, split:]
+                self.ring_count = self.ring_count + self.chunk_size
+                self.ring_cond.notify_all()
+
+    def get_stream_rate(self, window=None, end=None):
+        # count rates (counts/s) of all channels over the window (s) ending at sample number end (latest sample by default)
+        if window is None:
+            window = self.time_per_point
+        n = max(int(round(window * self.sampling_rate)), 1)
+        ring_size = self.ring.shape[1]
+        with self.ring_cond:
+            if end is None:
+                end = self.ring_count
+            if n >= ring_size or end - n - 1 < self.ring_count - ring_size:
+                raise ValueError('window of ' + str(window) + ' s is not in the ring buffer.')
+            if end - n - 1 < 0:
+                raise ValueError('not enough samples acquired yet for a window of ' + str(window) + ' s.')
+            last = self.ring[:, (end - 1) % ring_size]
+            first = self.ring[:, (end - n - 1) % ring_size]
+            # uint32 differences are correct across a counter rollover
+            d_ctrs = last - first
+        return d_ctrs / (n / self.sampling_rate)
+
+    def read_stream(self, window=None):
+        # wait for a new window (s) of samples, then return its count rates
+        if window is None:
+            window = self.time_per_point
+        n = max(int(round(window * self.sampling_rate)), 1)
+        # the window starts at the latest sample
+        with self.ring_cond:
+            end = max(self.ring_count, 1) + n
+            while self.streaming and self.ring_count < end:
+                self.ring_cond.wait()
+        if not self.streaming:
+            raise RuntimeError('DAQ streaming stopped.')
+        return self.get_stream_rate(window, end)
+
+    def stream_rates(self, window=None, n_windows=None):
+        # generator of count rates over consecutive windows (s), e.g. for a live count rate monitor
+        #   for rates in daq.stream_rates(0.1): ...
+        if window is None:
+            window = self.time_per_point
+        n = max(int(round(window * self.sampling_rate)), 1)
+        with self.ring_cond:
+            end = max(self.ring_count, 1)
+        idx = 0
+        while self.streaming and (n_windows is None or idx < n_windows):
+            end = end + n
+            with self.ring_cond:
+                while self.streaming and self.ring_count < end:
+                    self.ring_cond.wait()
+            if not self.streaming:
+                return
+            yield self.get_stream_rate(window, end)
+            idx = idx + 1
@@ -20,9 +20,19 @@
     Source: programming guide: http://int.rigol.com/File/TechDoc/20150909/DS1000B%20Programming%20Guide.pdf
 """
 from collections import OrderedDict
+import time
 import numpy as np
 from lantz.core import Action, Feat, MessageBasedDriver
 
+# commands that don't change the waveform preamble, anything else written to the scope clears the cached preambles
+WAVEFORM_READ_COMMANDS = (':WAV:SOUR', ':WAV:STAR', ':WAV:STOP', ':WAV:DATA', ':SING', ':STOP', ':RUN')
+# commands that change the waveform mode or format, or may reset them, the cached settings are forgotten after them
+WAVEFORM_SETTING_COMMANDS = (':WAV:MODE', ':WAV:FORM', '*RST')
+
+# maximum number of points per :WAV:DATA? read in RAW mode, from the MSO5000 programming guide
+MAX_POINTS_PER_READ = {'BYTE': 250000, 'WORD': 125000}
+RAW_DTYPES = {'BYTE': np.uint8, 'WORD': np.dtype('<u2')}
+
 class ScopeDriver(MessageBasedDriver):
     WAVEFORM_FORMATS = OrderedDict([
         ('word', 'WORD'),
@@ -59,6 +69,133 @@ class ScopeDriver(MessageBasedDriver):
     # write_termination = '\n'
     # read_termination = ''
 
+    # cached preambles, by (channel, waveform mode, waveform format)
+    _preambles = None
+    _waveform_settings = None
+    _raw_buffer = None
+
+    def write(self, command, *args, **kwargs):
+        # settings may change the scale or number of points, so the preambles are read again after them
+        if not command.endswith('?') and not command.upper().startswith(WAVEFORM_READ_COMMANDS):
+            self._preambles = None
+            if command.upper().startswith(WAVEFORM_SETTING_COMMANDS):
+                self._waveform_settings = None
+        return super().write(command, *args, **kwargs)
+
+    @Action()
+    def invalidate_preamble(self):
+        """
+        Forgets the cached preambles and waveform mode/format, needed if settings were changed on the front panel.
+        """
+        self._preambles = None
+        self._waveform_settings = None
+
+    def _set_waveform_settings(self, mode, frmt):
+        # only written when changed, since it clears the cached preambles
+        if self._waveform_settings != (mode, frmt):
+            self.write(':WAV:MODE {}'.format(mode))
+            self.write(':WAV:FORM {}'.format(frmt))
+            self._waveform_settings = (mode, frmt)
+
+    def _preamble(self, channel):
+        # preamble of a channel as numbers, read once until a setting changes
+        if self._preambles is None:
+            self._preambles = {}
+        key = (channel, self._waveform_settings)
+        if key not in self._preambles:
+            self.write(':WAV:SOUR CHAN{}'.format(channel))
+            values = self.query(':WAV:PRE?').split(',')
+            frmt, typ, points, count = (int(float(val)) for val in values[:4])
+            x_inc, x_or, x_ref, y_inc, y_or, y_ref = (float(val) for val in values[4:])
+            self._preambles[key] = {'points': points, 'x_inc': x_inc, 'x_or': x_or, 'x_ref': x_ref,
+                                    'y_inc': y_inc, 'y_or': y_or, 'y_ref': y_ref}
+        return self._preambles[key]
+
+    def _read_block(self, out):
+        # read one IEEE 488.2 binary block ('#9000250000...') straight into the out array
+        # read_bytes ignores the termination character, which can appear in binary data
+        header = self.resource.read_bytes(2)
+        n_digits = int(header[1:2])
+        n_bytes = int(self.resource.read_bytes(n_digits))
+        data = self.resource.read_bytes(n_bytes)
+        self.resource.read_bytes(1) # terminating newline
+        out[:] = np.frombuffer(data, dtype=out.dtype, count=out.size)
+
+    def _read_channel(self, channel, out, chunk):
+        # read the raw codes of a channel in chunks of at most chunk points, with :WAV:STAR/STOP
+        self.write(':WAV:SOUR CHAN{}'.format(channel))
+        points = out.size
+        for start in range(0, points, chunk):
+            stop = min(start + chunk, points)
+            self.write(':WAV:STAR {}'.format(start + 1))
+            self.write(':WAV:STOP {}'.format(stop))
+            self.write(':WAV:DATA?')
+            self._read_block(out[start:stop])
+
+    @Action()
+    def enabled_channels(self):
+        """
+        Returns the analog channels that are displayed.
+        """
+        return [ch for ch in ('1', '2', '3', '4') if int(self.query(':CHAN{}:DISP?'.format(ch)))]
+
+    @Action()
+    def capture(self, channels=None, mode='NORM', frmt='BYTE', single=False, stop=True, timeout=10, raw=False):
+        """
+        Returns the time trace and the waveforms of several channels from the same acquisition.
+
+        channels: list of channels, all displayed channels if None
+        mode: 'NORM' for the points on screen, 'RAW' for the full memory (read in chunks)
+        frmt: 'BYTE' or 'WORD', the MSO5000 ADC is 8 bits so 'BYTE' is half the transfer for the same data
+        single: take a new single acquisition and leave the scope stopped
+        stop: if not single, stop the scope while reading so all channels are from the same acquisition,
+              then run it again. Needed for 'RAW' mode.
+        raw: return the raw codes (uint8/uint16) instead of volts, volts = (raw - y_or - y_ref) * y_inc
+
+        Returns t (points,) and y (len(channels), points), preambles of the channels are in self.last_preambles
+        """
+        if channels is None:
+            channels = self.enabled_channels()
+        channels = [str(ch) for ch in channels]
+
+        # all channels are read from the same stopped acquisition
+        if single:
+            self.write(':SING')
+            start = time.time()
+            while self.query(':TRIG:STAT?').strip() != 'STOP':
+                if time.time() - start > timeout:
+                    raise TimeoutError('Rigol scope was not triggered within {} s.'.format(timeout))
+                time.sleep(0.01)
+        elif stop:
+            self.write(':STOP')
+        self._set_waveform_settings(mode, frmt)
+
+        preambles = [self._preamble(ch) for ch in channels]
+        points = preambles[0]['points']
+        dtype = RAW_DTYPES[frmt]
+
+        # the raw buffer is kept between captures of the same size, to avoid reallocating deep memory
+        shape = (len(channels), points)
+        if self._raw_buffer is None or self._raw_buffer.shape != shape or self._raw_buffer.dtype != dtype:
+            self._raw_buffer = np.empty(shape, dtype=dtype)
+        chunk = MAX_POINTS_PER_READ[frmt] if mode == 'RAW' else points
+        for idx, ch in enumerate(channels):
+            self._read_channel(ch, self._raw_buffer[idx], chunk)
+        if stop and not single:
+            self.write(':RUN')
+
+        pre = preambles[0]
+        t = (np.arange(points, dtype=np.float64) - pre['x_ref']) * pre['x_inc'] + pre['x_or']
+        self.last_preambles = dict(zip(channels, preambles))
+        if raw:
+            return t, self._raw_buffer.copy()
+
+        y = np.empty(shape, dtype=np.float64)
+        for idx, pre in enumerate(preambles):
+            np.subtract(self._raw_buffer[idx], pre['y_or'] + pre['y_ref'], out=y[idx])
+            y[idx] *= pre['y_inc']
+        return t, y
+
     @Feat()
     def idn(self):
         """
@@ -86,25 +223,12 @@ class ScopeDriver(MessageBasedDriver):
     def get_waveform_trace(self, channel=None):
         """
         Returns waveform x and y traces, with units.
-        """
-        result_string = self.query(':WAV:PRE?')
-        frmt, typ, points, count, x_inc, x_or, x_ref, y_inc, y_or, y_ref = result_string.split(',')
 
-        x_inc = float(x_inc)
-        x_or = float(x_or)
-        y_inc = float(y_inc)
-        y_or = float(y_or)
-        x_ref = int(float(x_ref))
-        y_ref = int(float(y_ref))
-
-        raw = self.get_waveform_data(channel=channel)
-        raw = raw.astype(np.int8, copy=False)
-
-        t_i = (np.arange(raw.size, dtype='float') - x_ref) * x_inc + x_or
-        y_i = np.empty(raw.size, dtype='float')
-        y_i = (raw - y_ref) * y_inc + y_or
-
-        return t_i, y_i
+        channel: channel to read, the first displayed channel if None (not the current :WAV:SOUR,
+                 which capture sets for every channel it reads)
+        """
+        t_i, y_i = self.capture(channels=None if channel is None else [channel], stop=False)
+        return t_i, y_i[0]
 
     @Feat(values=WAVEFORM_FORMATS)
     def waveform_format(self):
@@ -42,18 +42,92 @@ class PARAMETER(Enum):
 
 class SIGLENT_PSU():
 
-    def __init__(self, ip, port=5025):
+    # SCPI over the raw socket:
+    #   every command is terminated by self.terminator, replies are read until the terminator
+    #   after a setting, '*OPC?' returns once the PSU has processed it, instead of sleeping for a fixed time
+    #       not every SPD3303X firmware answers '*OPC?' over the raw socket, so it is checked once at connect,
+    #       and the fixed self._sleep (s) is used if there is no reply within the timeout
+    #       if a single '*OPC?' isn't answered, that setting falls back to the fixed sleep
+    #   with use_opc=False, the fixed sleep is always used
+    def __init__(self, ip, port=5025, timeout=1, terminator='\n', use_opc=True):
         self.ip = ip
         self.port = port
         self._sleep = 1
+        self.terminator = terminator
+        self.use_opc = use_opc
+        self._buffer = b''
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.s.settimeout(1)
+        self.s.settimeout(timeout)
+        # commands are short, send them right away instead of waiting to fill a packet
+        self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.s.connect((self.ip , self.port))
+        if self.use_opc:
+            self.use_opc = self.check_opc()
+
+    def close(self):
+        self.s.close()
+
+    def write(self, cmd):
+        self.s.sendall((cmd + self.terminator).encode("utf-8"))
+
+    def write_many(self, cmds):
+        # several commands in a single write, so they are sent in one packet
+        self.s.sendall("".join(cmd + self.terminator for cmd in cmds).encode("utf-8"))
+
+    def read_line(self):
+        # read until the terminator, anything received after it is kept for the next read
+        term = self.terminator.encode("utf-8")
+        while term not in self._buffer:
+            data = self.s.recv(4096)
+            if not data:
+                raise ConnectionError("SIGLENT PSU closed the connection.")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(term, 1)
+        return line.decode('utf-8').strip()
+
+    def query(self, cmd):
+        self.write(cmd)
+        return self.read_line()
+
+    def check_opc(self):
+        # True if the PSU answers '*OPC?'
+        try:
+            self.query("*OPC?")
+            return True
+        except socket.timeout:
+            print("SIGLENT PSU: no reply to *OPC?, waiting " + str(self._sleep) + " s after each setting instead.")
+            self.flush()
+            return False
+
+    def flush(self):
+        # drop partial or late replies (e.g. to a timed out '*OPC?'), so they aren't read as the next reply
+        self._buffer = b''
+        timeout = self.s.gettimeout()
+        self.s.settimeout(0)
+        try:
+            while self.s.recv(4096):
+                pass
+        except (BlockingIOError, socket.timeout):
+            pass
+        finally:
+            self.s.settimeout(timeout)
+
+    def write_and_wait(self, cmd):
+        # write a setting and wait until it is processed, the '*OPC?' is sent in the same packet
+        if self.use_opc:
+            self.write_many([cmd, "*OPC?"])
+            try:
+                self.read_line()
+            except socket.timeout:
+                print("SIGLENT PSU: no reply to *OPC?, waiting " + str(self._sleep) + " s instead.")
+                time.sleep(self._sleep)
+                self.flush()
+        else:
+            self.write(cmd)
+            time.sleep(self._sleep)
 
     def identify(self):
-        self.s.sendall(b'*IDN?')
-        #self.s.sendall(b'\n')
-        reply = self.s.recv(4096).decode('utf-8').strip()
+        reply = self.query('*IDN?')
         reply = reply.split(",")
         reply_d = {}
         if len(reply) == 5:
@@ -67,14 +141,20 @@ class SIGLENT_PSU():
 
     def measure(self, ch, parameter):
         cmd = "MEASURE:" + parameter.name + "? " + ch.name
-        cmd_b = cmd.encode("utf-8")
-        self.s.sendall(cmd_b)
-        #self.s.sendall(b'\n')
-        time.sleep(self._sleep)
-        reply = self.s.recv(4096).decode('utf-8').strip()
+        reply = self.query(cmd)
         reply = float(reply)
         return reply
 
+    def measure_all(self, channels=(CHANNEL.CH1, CHANNEL.CH2), parameters=(PARAMETER.VOLTAGE, PARAMETER.CURRENT)):
+        # all the queries are sent in one write, then the replies are read in order
+        # returns {channel name: {parameter name: value}}
+        pairs = [(ch, parameter) for ch in channels for parameter in parameters]
+        self.write_many(["MEASURE:" + parameter.name + "? " + ch.name for ch, parameter in pairs])
+        reply = {}
+        for ch, parameter in pairs:
+            reply.setdefault(ch.name, {})[parameter.name] = float(self.read_line())
+        return reply
+
     def set(self, ch, parameter, value):
         if parameter == PARAMETER.POWER:
             raise ValueError("Can't set POWER. Only VOLTAGE and CURRENT are supported.")
@@ -83,32 +163,19 @@ class SIGLENT_PSU():
             raise ValueError("Can't set output for CH3. Use mechanical selector on the instrument.")
 
         cmd = ch.name + ":" + parameter.name + " " + str(value)
-        cmd_b = cmd.encode("utf-8")
-        self.s.sendall(cmd_b)
-        #self.s.sendall(b'\n')
-        time.sleep(self._sleep)
+        self.write_and_wait(cmd)
 
     def output(self, ch, status):
         cmd = "OUTPUT " + ch.name + "," + status.name
-        cmd_b = cmd.encode("utf-8")
-        self.s.sendall(cmd_b)
-        #self.s.sendall(b'\n')
-        time.sleep(self._sleep)
+        self.write_and_wait(cmd)
 
     def track(self, tr):
         cmd = "OUTPUT:TRACK " +  str(tr.value)
-        cmd_b = cmd.encode("utf-8")
-        self.s.sendall(cmd_b)
-        #self.s.sendall(b'\n')
-        time.sleep(self._sleep)
+        self.write_and_wait(cmd)
 
     def system(self):
         cmd = "SYSTem:STATus?"
-        cmd_b = cmd.encode("utf-8")
-        self.s.sendall(cmd_b)
-        #self.s.sendall(b'\n')
-        time.sleep(self._sleep)
-        reply = self.s.recv(4096).decode('utf-8').strip()
+        reply = self.query(cmd)
         reply = int(reply, 16)
 
         response = {}
@@ -3,39 +3,140 @@
 
 import pyvisa as visa
 import time
+import threading
 import numpy as np
 
+# with keep_open=True (default) the VISA session stays open and the meter is configured for power once,
+#   each reading is then a single 'READ?' query, so read_powers runs at the meter's native rate
+#   the meter averages set_averaging(count) samples internally for each reading (about 0.3 ms per sample)
+# with keep_open=False the session is opened and closed around every query, as in the Thorlabs examples
+# start_streaming reads continuously in a background thread, each reading is timestamped with time.time()
+#   so it can be matched to the points of a sweep with get_stream(t_start, t_end)
 class PM100():
 
-    def __init__(self, resource_name):
+    def __init__(self, resource_name, keep_open=True, averaging=None):
         rm = visa.ResourceManager()
         self._inst = rm.open_resource(resource_name)
         self._inst.read_termination = '\r\n'
         self._inst.write_termination = '\r\n'
+        self.keep_open = keep_open
+        if not keep_open:
+            self._inst.close()
+        self._lock = threading.Lock()
+        self._configured = False
+
+        self.streaming = False
+        self.stream_thread = None
+        self.stream_times = None
+        self.stream_powers = None
+        self.stream_count = 0
+
+        if averaging is not None:
+            self.set_averaging(averaging)
+
+    def query(self, cmd):
+        with self._lock:
+            if not self.keep_open:
+                self._inst.open()
+            try:
+                return self._inst.query(cmd)
+            finally:
+                if not self.keep_open:
+                    self._inst.close()
+
+    def write(self, cmd):
+        with self._lock:
+            if not self.keep_open:
+                self._inst.open()
+            try:
+                self._inst.write(cmd)
+            finally:
+                if not self.keep_open:
+                    self._inst.close()
+
+    def close(self):
+        self.stop_streaming()
+        if self.keep_open:
+            self._inst.close()
 
     def id(self):
-        self._inst.open()
-        ret = self._inst.query("*IDN?")
-        self._inst.close()
-        return ret
+        return self.query("*IDN?")
 
-    def read_power(self):
-        self._inst.open()
+    def set_averaging(self, count):
+        # number of samples averaged by the meter for each reading
+        self.write("SENSe:AVERage:COUNt " + str(int(count)))
 
-        # units in watts
+    def get_averaging(self):
+        return int(self.query("SENSe:AVERage:COUNt?"))
+
+    def configure_power(self):
+        # after this, 'READ?' measures power without reconfiguring the meter every time
+        self.write("CONFigure:POWer")
+        self._configured = True
+
+    def read_power(self):
+        # units in watts, nan if the reading failed
         try:
-            self._inst.open()
-            pow = self._inst.query("MEASure:POWER?")
-            self._inst.close()
-        except:
+            if self.keep_open:
+                if not self._configured:
+                    self.configure_power()
+                pow = float(self.query("READ?"))
+            else:
+                pow = float(self.query("MEASure:POWER?"))
+        except Exception:
             print('error reading power on Thorlabs PM100USB.')
-            pow = 'NA'
+            pow = np.nan
         return pow
 
     def read_powers(self, n, t=0):
         powers = np.zeros(n)
         for idx in range(n):
             powers[idx] = self.read_power()
-            time.sleep(t)
+            if t > 0:
+                time.sleep(t)
 
         return powers
+
+    def start_streaming(self, buffer_size=100000):
+        # read continuously in the background into ring buffers of timestamps and powers
+        if self.stream_thread is not None:
+            return
+        self.stream_times = np.zeros(buffer_size)
+        self.stream_powers = np.zeros(buffer_size)
+        self.stream_count = 0
+        self.streaming = True
+        self.stream_thread = threading.Thread(target=self.stream_loop, daemon=True)
+        self.stream_thread.start()
+
+    def stop_streaming(self):
+        if self.stream_thread is None:
+            return
+        self.streaming = False
+        self.stream_thread.join()
+        self.stream_thread = None
+
+    def stream_loop(self):
+        buffer_size = len(self.stream_times)
+        while self.streaming:
+            t0 = time.time()
+            pow = self.read_power()
+            t1 = time.time()
+            idx = self.stream_count % buffer_size
+            # the reading is timestamped halfway through the query
+            self.stream_times[idx] = 0.5*(t0 + t1)
+            self.stream_powers[idx] = pow
+            self.stream_count = self.stream_count + 1
+
+    def get_stream(self, t_start=None, t_end=None):
+        # timestamps and powers of the buffered readings between t_start and t_end (time.time() values)
+        buffer_size = len(self.stream_times)
+        count = self.stream_count
+        idx = np.arange(max(count - buffer_size, 0), count) % buffer_size
+        times = self.stream_times[idx]
+        powers = self.stream_powers[idx]
+        keep = np.ones(len(times), dtype=bool)
+        if t_start is not None:
+            keep &= times >= t_start
+        if t_end is not None:
+            keep &= times <= t_end
+        return times[keep], powers[keep]
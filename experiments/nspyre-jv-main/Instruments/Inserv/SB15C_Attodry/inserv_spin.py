@@ -10,6 +10,7 @@ with InstrumentServer() as inserv:
 
     # DAQ
     inserv.add('daq', HERE / '../../Drivers/NI' / 'PCIe6321.py', 'DAQ')
+    # inserv.add('daq', HERE / '../../Drivers/NI' / 'PCIe6321_sim.py', 'DAQ') # simulated DAQ, for benchmarking without hardware
 
     # signal generator
     inserv.add('sg0', HERE / '../../Drivers/SRS' / 'sg396.py', 'SG396', resource_name='TCPIP::171.64.85.54::inst0::INSTR')
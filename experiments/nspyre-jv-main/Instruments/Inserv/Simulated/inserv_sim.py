@@ -0,0 +1,14 @@
+import logging
+from pathlib import Path
+from nspyre import inserv_cli
+from nspyre import InstrumentServer
+
+HERE = Path(__file__).parent
+
+# create a new instrument server with simulated instruments, for benchmarking sweeps without hardware
+with InstrumentServer() as inserv:
+    # simulated DAQ, same interface as PCIe6321.DAQ
+    inserv.add('daq', HERE / '../../Drivers/NI' / 'PCIe6321_sim.py', 'DAQ')
+
+    # run a CLI (command-line interface) that allows the user to enter commands to control the server
+    inserv_cli(inserv)
@@ -0,0 +1,193 @@
+# check if the laser is multimode from wavemeter interferometer patterns, for many patterns at once
+#   same method as wavemeter_test.py, vectorized over a batch of patterns (one pattern per row):
+#       smooth out ripples with a moving average of pts_to_smooth points
+#       find the peaks with a prominence of at least pk_prominence (same definition as scipy.signal.find_peaks)
+#       compare the variance of the distance between peaks to its mean
+#   single mode: the fringes are evenly spaced, var/mean << 1
+#   multi mode: the spacing alternates between short and long distances, var/mean >> 1
+#   use the "short" pattern (first pattern returned by get_pattern), the "long" one doesn't separate the two cases
+#   for a few patterns, scipy.signal.find_peaks is faster one row at a time than the vectorized peak search,
+#       so it is used if scipy is installed (same peaks)
+#
+# example:
+#   pattern_short, pattern_long = proxy.get_pattern(channel)
+#   if is_multimode(pattern_short)[0]:
+#       print('laser is multimode')
+import numpy as np
+
+# scipy is optional, only faster for a few patterns
+try:
+    import scipy.signal
+except ImportError:
+    scipy = None
+
+# parameters for data processing
+pts_to_smooth = 10
+pk_prominence = 20
+sm_threshold = 0.5   # var/mean above this is multimode
+scipy_max_rows = 4   # up to this many patterns, peaks are found one row at a time with scipy (if installed)
+
+def pattern_array(patterns):
+    # patterns as a 2d float array, one pattern per row (a single pattern gives a single row)
+    patterns = np.asarray(patterns, dtype=np.float64)
+    if patterns.ndim == 1:
+        patterns = patterns[np.newaxis, :]
+    return patterns
+
+def smooth(patterns, box_pts=pts_to_smooth):
+    # moving average of each row, same as np.convolve(y, np.ones(box_pts)/box_pts, mode='same')
+    patterns = pattern_array(patterns)
+    n_pts = patterns.shape[1]
+    offset = (box_pts - 1) // 2
+    # column j+box_pts+1 is the sum of y[0..j], zero for j < 0 and the sum of the whole row for j > n_pts-1
+    csum = np.zeros((patterns.shape[0], n_pts + box_pts + offset + 1))
+    np.cumsum(patterns, axis=1, out=csum[:, box_pts+1:box_pts+1+n_pts])
+    csum[:, box_pts+1+n_pts:] = csum[:, box_pts+n_pts:box_pts+1+n_pts]
+    # sum of y[m+offset-box_pts+1 .. m+offset] for each m
+    return (csum[:, offset+box_pts+1:offset+box_pts+1+n_pts] - csum[:, offset+1:offset+1+n_pts]) / box_pts
+
+def local_maxima(patterns):
+    # row and column of the local maxima of each row, flat peaks are counted once at their middle
+    d = np.diff(patterns, axis=1)
+    rising = d[:, :-1] > 0
+    rows, cols = np.nonzero(rising & (d[:, 1:] < 0))
+
+    # flat peaks: rising into position a, then flat until b, then falling
+    flat_rows, a = np.nonzero(rising & (d[:, 1:] == 0))
+    if len(a):
+        n_d = d.shape[1]
+        a = a + 1
+        nonzero = np.flatnonzero(d)
+        b = nonzero[np.minimum(np.searchsorted(nonzero, flat_rows*n_d + a), len(nonzero) - 1)] - flat_rows*n_d
+        falling = (b > a) & (b < n_d)
+        flat_rows, a, b = flat_rows[falling], a[falling], b[falling]
+        falling = d[flat_rows, b] < 0
+        rows = np.concatenate([rows, flat_rows[falling]])
+        cols = np.concatenate([cols + 1, (a[falling] + b[falling]) // 2])
+        order = np.lexsort((cols, rows))
+        return rows[order], cols[order]
+    return rows, cols + 1
+
+def _lowest_to_higher_peak(height, seg_min, rows, idx):
+    # for the peaks idx, the lowest point between the peak and the nearest higher peak on its left
+    #   (or the start of the row), seg_min is the lowest point between each peak and the previous one
+    # peaks are skipped in blocks of 2**k, largest first, using tables of the highest peak and the
+    #   lowest point of the blocks of 2**k peaks ending at each peak
+    n = len(height)
+    new_row = np.concatenate([[True], rows[1:] != rows[:-1]])
+    row_first = np.maximum.accumulate(np.where(new_row, np.arange(n), 0))
+    max_height = [height]
+    min_seg = [seg_min]
+    while 2**len(max_height) <= np.max(idx - row_first[idx]):
+        half = 2**(len(max_height) - 1)
+        # blocks that would start before the first peak are never used, they are left shorter
+        max_k = np.empty(n)
+        min_k = np.empty(n)
+        max_k[:half] = max_height[-1][:half]
+        min_k[:half] = min_seg[-1][:half]
+        np.maximum(max_height[-1][half:], max_height[-1][:-half], out=max_k[half:])
+        np.minimum(min_seg[-1][half:], min_seg[-1][:-half], out=min_k[half:])
+        max_height.append(max_k)
+        min_seg.append(min_k)
+
+    lowest = seg_min[idx]
+    h = height[idx]
+    first = row_first[idx]
+    last = idx - 1   # last peak not skipped yet
+    for k in reversed(range(len(max_height))):
+        skip = (last - 2**k + 1 >= first) & (max_height[k][last] <= h)
+        np.minimum(lowest, np.where(skip, min_seg[k][last], np.inf), out=lowest)
+        last -= skip * 2**k
+    return lowest
+
+def prominent_peaks(patterns, rows, cols, prominence=pk_prominence):
+    # True for each peak with at least the given prominence, with the definition of scipy.signal.find_peaks:
+    #   the height above the higher of the lowest points on each side, searching on each side
+    #   up to the first point higher than the peak (or the edge of the pattern)
+    # the first higher point is on the flank of the nearest higher peak, so only the peaks and the lowest
+    #   points between consecutive peaks are needed. Most peaks are decided by the neighbouring peaks:
+    #   a side is deep enough if the lowest point before the neighbouring peak is low enough, and too
+    #   shallow if it isn't and the neighbouring peak is higher. For the other sides the lowest point
+    #   up to the nearest higher peak is needed
+    n_patterns, n_pts = patterns.shape
+    n = len(rows)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    flat = patterns.ravel()
+    pos = rows * n_pts + cols
+    height = flat[pos]
+
+    # lowest point of each range between consecutive peaks and row starts,
+    #   peaks are sorted and never at the start of a row, so peak k is range k + rows[k] + 1
+    starts = np.arange(n_patterns) * n_pts
+    bounds = np.insert(pos, np.searchsorted(pos, starts), starts)
+    seg_min = np.minimum.reduceat(flat, bounds)
+    seg = np.arange(n) + rows + 1
+    before = seg_min[seg - 1]   # from the previous peak (or the start of the row) to the peak
+    after = seg_min[seg]        # from the peak to the next peak (or the end of the row)
+
+    base = height - prominence
+    same_row = rows[1:] == rows[:-1]
+    prev_higher = np.concatenate([[False], same_row & (height[:-1] > height[1:])])
+    next_higher = np.concatenate([same_row & (height[1:] > height[:-1]), [False]])
+    left_ok = before <= base
+    right_ok = after <= base
+    keep = (left_ok | ~prev_higher) & (right_ok | ~next_higher)
+    left = np.nonzero(keep & ~left_ok)[0]
+    right = np.nonzero(keep & ~right_ok)[0]
+    if len(left) == 0 and len(right) == 0:
+        return keep
+
+    # the right side is the left side of the reversed peaks, both are done at once
+    lowest = _lowest_to_higher_peak(np.concatenate([height, height[::-1]]),
+                                    np.concatenate([before, after[::-1]]),
+                                    np.concatenate([rows, rows[::-1] + n_patterns]),
+                                    np.concatenate([left, 2*n - 1 - right]))
+    undecided = np.concatenate([left, right])
+    keep[undecided[lowest > base[undecided]]] = False
+    return keep
+
+def find_peaks(patterns, prominence=pk_prominence):
+    # row and column of the peaks of each row with at least the given prominence
+    patterns = pattern_array(patterns)
+    if scipy is not None and patterns.shape[0] <= scipy_max_rows:
+        peaks = [scipy.signal.find_peaks(row, prominence=prominence)[0] for row in patterns]
+        rows = np.repeat(np.arange(len(peaks)), [len(row_peaks) for row_peaks in peaks])
+        if len(rows) == 0:
+            return rows, rows
+        return rows, np.concatenate(peaks)
+    rows, cols = local_maxima(patterns)
+    keep = prominent_peaks(patterns, rows, cols, prominence=prominence)
+    return rows[keep], cols[keep]
+
+def peak_spacing_stats(patterns, box_pts=pts_to_smooth, prominence=pk_prominence):
+    # mean and variance of the distance between peaks of each (smoothed) pattern, and the number of peaks
+    #   variance with n-1 degrees of freedom, as statistics.variance, nan if a pattern has less than 3 peaks
+    patterns = smooth(patterns, box_pts=box_pts)
+    n_patterns = patterns.shape[0]
+    rows, cols = find_peaks(patterns, prominence=prominence)
+
+    # peaks are sorted by row then column, so the distances between peaks are consecutive differences
+    same_row = rows[1:] == rows[:-1]
+    diff_rows = rows[1:][same_row]
+    diffs = np.diff(cols)[same_row].astype(np.float64)
+
+    n_peaks = np.bincount(rows, minlength=n_patterns)
+    n_diffs = np.bincount(diff_rows, minlength=n_patterns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(diff_rows, weights=diffs, minlength=n_patterns) / n_diffs
+        sq_dev = (diffs - mean[diff_rows])**2
+        var = np.bincount(diff_rows, weights=sq_dev, minlength=n_patterns) / (n_diffs - 1)
+    mean[n_diffs < 1] = np.nan
+    var[n_diffs < 2] = np.nan
+    return mean, var, n_peaks
+
+def multimode_ratio(patterns, box_pts=pts_to_smooth, prominence=pk_prominence):
+    # var/mean of the distance between peaks of each pattern, nan if there are not enough peaks
+    mean, var, n_peaks = peak_spacing_stats(patterns, box_pts=box_pts, prominence=prominence)
+    return var / mean
+
+def is_multimode(patterns, threshold=sm_threshold, box_pts=pts_to_smooth, prominence=pk_prominence):
+    # True for each pattern that is multimode, patterns without enough peaks to decide are not multimode
+    ratio = multimode_ratio(patterns, box_pts=box_pts, prominence=prominence)
+    return ratio > threshold
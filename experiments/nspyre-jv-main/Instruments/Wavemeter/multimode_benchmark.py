@@ -0,0 +1,114 @@
+# regression check and benchmark of multimode.py against the saved example patterns
+#   checks that the example single mode and multi mode "short" patterns are classified correctly,
+#   compares the peaks to scipy.signal.find_peaks (the method of wavemeter_test.py), if scipy is installed,
+#   and times the classification of a batch of patterns
+# run in command window:
+# python C:\Users\Public\nspyre-jv\Instruments\Wavemeter\multimode_benchmark.py
+
+import os
+import sys
+import time
+import statistics
+import numpy as np
+import multimode
+
+# scipy is optional, only needed to compare to the previous method
+try:
+    import scipy.signal
+except ImportError:
+    scipy = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# expected classification of the saved "short" patterns
+EXPECTED = {
+    'sm_short': False,
+    'mm_short': True,
+    }
+
+# number of patterns classified at once, and number of repeats, for timing
+batch_size = 1000
+repeats = 10
+
+def load_pattern(name):
+    return np.load(os.path.join(HERE, 'example_patterns', name + '.npz'))['arr_0']
+
+def reference_ratio(pattern):
+    # var/mean of the distance between peaks, one pattern at a time as in wavemeter_test.py
+    box = np.ones(multimode.pts_to_smooth)/multimode.pts_to_smooth
+    smoothed = np.convolve(pattern, box, mode='same')
+    peaks = scipy.signal.find_peaks(smoothed, prominence=multimode.pk_prominence)[0]
+    diff = np.diff(peaks).tolist()
+    return statistics.variance(diff) / statistics.mean(diff)
+
+def make_batch(patterns, n, noise=5, seed=0):
+    # n patterns: copies of the examples with added noise, like successive readings of the wavemeter
+    rng = np.random.default_rng(seed)
+    batch = np.asarray(patterns, dtype=np.float64)[np.arange(n) % len(patterns)]
+    return batch + rng.normal(0, noise, batch.shape)
+
+def main():
+    failed = False
+
+    # classification of the saved patterns
+    names = list(EXPECTED)
+    patterns = np.array([load_pattern(name) for name in names])
+    ratio = multimode.multimode_ratio(patterns)
+    multi = multimode.is_multimode(patterns)
+    for name, r, m in zip(names, ratio, multi):
+        ok = m == EXPECTED[name]
+        failed = failed or not ok
+        print(name + ': var/mean = ' + str(round(r,3)) + ', multimode = ' + str(m) + ('' if ok else ', EXPECTED ' + str(EXPECTED[name])))
+
+    batch = make_batch(patterns, batch_size)
+    expected_batch = np.array([EXPECTED[name] for name in names])[np.arange(batch_size) % len(names)]
+
+    # same peaks and classification as the previous method
+    if scipy is not None:
+        smoothed = multimode.smooth(batch)
+        rows, cols = multimode.find_peaks(smoothed)
+        mismatches = 0
+        for idx in range(batch_size):
+            peaks = scipy.signal.find_peaks(smoothed[idx], prominence=multimode.pk_prominence)[0]
+            if not np.array_equal(peaks, cols[rows == idx]):
+                mismatches = mismatches + 1
+        failed = failed or mismatches > 0
+        print('patterns with different peaks than scipy.signal.find_peaks: ' + str(mismatches) + ' out of ' + str(batch_size))
+
+        start = time.perf_counter()
+        ratio_ref = np.array([reference_ratio(p) for p in batch])
+        reference_time = time.perf_counter() - start
+        print('wavemeter_test.py method, one pattern at a time: ' + str(round(1e6*reference_time/batch_size,1)) + ' us per pattern')
+        # statistics computes exactly (with fractions), multimode with float64 sums, so the ratios only agree
+        #   up to rounding, the classifications are compared instead
+        multi_ref = ratio_ref > multimode.sm_threshold
+        different = np.count_nonzero(multi_ref != multimode.is_multimode(batch))
+        failed = failed or different > 0
+        print('patterns classified differently than the wavemeter_test.py method: ' + str(different) + ' out of ' + str(batch_size))
+    else:
+        print('scipy not installed, skipping comparison to scipy.signal.find_peaks')
+
+    # timing of the batch classification
+    start = time.perf_counter()
+    for k in range(repeats):
+        multi = multimode.is_multimode(batch)
+    batch_time = (time.perf_counter() - start) / repeats
+    print('multimode.is_multimode, batch of ' + str(batch_size) + ': ' + str(round(1e6*batch_time/batch_size,1)) + ' us per pattern')
+
+    # a single pattern is fast, it's repeated batch_size times for a stable timing
+    start = time.perf_counter()
+    for k in range(batch_size):
+        multimode.is_multimode(batch[k])
+    single_time = (time.perf_counter() - start) / batch_size
+    print('multimode.is_multimode, single pattern' + ('' if scipy is None else ' (with scipy.signal.find_peaks)') + ': ' + str(round(1e6*single_time,1)) + ' us')
+
+    # limit of the method itself (same result as wavemeter_test.py), not a regression
+    wrong = np.count_nonzero(multi != expected_batch)
+    print('noisy copies classified differently than the example they come from: ' + str(wrong) + ' out of ' + str(batch_size))
+
+    if failed:
+        sys.exit('regression check failed')
+    print('regression check passed')
+
+if __name__ == '__main__':
+    main()
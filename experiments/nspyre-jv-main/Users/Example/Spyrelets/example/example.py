@@ -74,8 +74,9 @@ class RandomVsTime():
                 def get_z():
                     return random.randint(-100,100)
 
-            # run scan
-            dataset = Sweep2DExample(params).run(X,Y,Z)
+            # run scan, streaming each completed y row to a checkpoint
+            checkpoint_file = generate_checkpoint_name(self.params, str(self.__class__.__name__))
+            dataset = Sweep2DExample(params).run(X,Y,Z,checkpoint_file=checkpoint_file)
 
             # save data
             filename = autosave_data(str(self.__class__.__name__), self.params, dataset)
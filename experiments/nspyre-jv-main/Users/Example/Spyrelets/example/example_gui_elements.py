@@ -73,7 +73,8 @@ class PlotWidgetRandomVsTime(GUIPlot1D):
     def update(self):
         try:
             if self.sink.pop():
-                self.set_data('ch0', self.sink.x, self.sink.z_ch0)
+                # error bars from the running standard error of the average
+                self.set_data('ch0', self.sink.x, self.sink.z_ch0, error=self.sink.data.get('z_ch0_sem'))
                 if self.plot_style['plot_last_data']:
                     try:
                         self.set_data('ch0_last', self.sink.x, self.sink.z_ch0_last)
@@ -3,17 +3,20 @@ import matplotlib.cm as cm
 import numpy as np
 import json
 import os
+from storage_backends import get_backend_for_file
 
 def load_dataset(filename):
-
-    f = open(filename)
-    dataset = json.load(f)
-    f.close()
+    # load a dataset saved by autosave_data in any supported format (json, npz, hdf5)
+    dataset = get_backend_for_file(filename).load(filename)
 
     dataset_name = os.path.basename(filename).partition('.')[0]
 
     return dataset, dataset_name
 
+def figure_name(filename):
+    # path and name to save image next to the dataset
+    return os.path.splitext(filename)[0] + '.png'
+
 def autoplot_sweep1d(filename, save_figure=True, show_figure=False):
     # load data
     dataset, dataset_name = load_dataset(filename)
@@ -21,7 +24,10 @@ def autoplot_sweep1d(filename, save_figure=True, show_figure=False):
     # plot
     x = dataset['x']
     z0 = dataset['z_ch0']
-    plt.plot(x,z0,'-o',label='ch0')
+    if 'z_ch0_sem' in dataset:
+        plt.errorbar(x,z0,yerr=dataset['z_ch0_sem'],fmt='-o',label='ch0')
+    else:
+        plt.plot(x,z0,'-o',label='ch0')
 
     # plot data from 2nd channel, if enabled
     try:
@@ -39,7 +45,7 @@ def autoplot_sweep1d(filename, save_figure=True, show_figure=False):
 
     # save
     if save_figure:
-        plt.savefig(filename.replace('.json','.png'))
+        plt.savefig(figure_name(filename))
 
     # pop up
     if show_figure:
@@ -81,7 +87,7 @@ def autoplot_sweep2d(filename, save_figure=True, show_figure=False):
 
     # save
     if save_figure:
-        plt.savefig(filename.replace('.json','.png'))
+        plt.savefig(figure_name(filename))
 
     # pop up
     if show_figure:
@@ -104,7 +110,7 @@ def autoplot_spectrum1d(filename, save_figure=True, show_figure=False):
 
     # save
     if save_figure:
-        plt.savefig(filename.replace('.json','.png'))
+        plt.savefig(figure_name(filename))
 
     # pop up
     if show_figure:
@@ -127,15 +133,10 @@ def plot_colourline(x,y,c,c_min,c_max, **xargs):
 def autoplot_scan2d_pcolormesh(filename, save_figure=True):
 
     # load sweep
-    f = open(filename)
-    dataset = json.load(f)
-    f.close()
-
-    # name of dataset, to be used as plot title
-    dataset_name = os.path.basename(filename).partition('.')[0]
+    dataset, dataset_name = load_dataset(filename)
 
     # path and name to save image
-    filename_png = filename.replace('.json','.png')
+    filename_png = figure_name(filename)
 
     # process sweep
     x = np.array(dataset['x'])
@@ -165,15 +166,10 @@ def autoplot_scan2d_pcolormesh(filename, save_figure=True):
 def autoplot_scan2d(filename, save_figure=True):
 
     # load sweep
-    f = open(filename)
-    dataset = json.load(f)
-    f.close()
-
-    # name of dataset, to be used as plot title
-    dataset_name = os.path.basename(filename).partition('.')[0]
+    dataset, dataset_name = load_dataset(filename)
 
     # path and name to save image
-    filename_png = filename.replace('.json','.png')
+    filename_png = figure_name(filename)
 
     # process sweep
     x = np.array(dataset['x'])
@@ -284,7 +280,7 @@ def autoplot_scan2d_unequalX(filename, save_figure=True, show_figure=False, x_sh
     print('plotting finished')
 
     if save_figure:
-        plt.savefig(filename.replace('.json','.png'))
+        plt.savefig(figure_name(filename))
 
     if show_figure:
         plt.show()
@@ -376,7 +372,7 @@ def autoplot_vna1d(filename, plot_type='dB', save_figure=True, show_figure=False
 
     # save
     if save_figure:
-        plt.savefig(filename.replace('.json','.png'))
+        plt.savefig(figure_name(filename))
 
     # pop up
     if show_figure:
@@ -3,17 +3,15 @@ from datetime import datetime
 import os
 from pathlib import Path
 import json
+from storage_backends import get_backend, DEFAULT_SAVE_FORMAT
 
-def autosave_data(dataset_name='unnamed_dataset', params='{}', dataset='{}'):
+def autosave_data(dataset_name='unnamed_dataset', params='{}', dataset='{}', save_format=None):
     print('autosaving....')
 
-    # automatically save params to datasets
-    dataset['params'] = params
-
-    # convert numpy arrays to lists, which are json serializable
-    for key in dataset:
-        if isinstance(dataset[key], np.ndarray):
-            dataset[key] = dataset[key].tolist()
+    # storage backend, set by params['save_format'] if not specified: 'npz' (default), 'hdf5', or 'json'
+    if save_format is None:
+        save_format = params.get('save_format', DEFAULT_SAVE_FORMAT)
+    backend = get_backend(save_format)
 
     # create folder to store data
     folder_name = datetime.today().strftime('%Y-%m-%d')
@@ -62,12 +60,19 @@ def autosave_data(dataset_name='unnamed_dataset', params='{}', dataset='{}'):
                                     prefix=prefix, \
                                     comment=comment, \
                                     avg_counter=avg_counter, \
+                                    extension=backend.extension, \
                                     )
-    with open(filename,'w') as df:
-        json.dump(serialize_dict(dataset), df)
+
+    # params are saved along with the dataset
+    backend.save(filename, serialize_dict(dataset), params)
 
     return filename
 
+def generate_checkpoint_name(params, dataset_name='unnamed_dataset', extension='.ckpt'):
+    # name of the checkpoint written while a sweep is running, saved next to the autosaved data
+    folder_name = datetime.today().strftime('%Y-%m-%d')
+    return generate_data_name(params, dataset_name + '_checkpoint', folder_name=folder_name, extension=extension)
+
 def serialize_dict(dict_original):
     # make dictionary "serializable", necessary for kwargs to be saved as a json file
     dict_serialized = {}
@@ -82,7 +87,7 @@ def get_last_sweep_path_and_name():
     text_file.close()
     return last_path_and_name
 
-def generate_data_name(params, dataset_name='unnamed_spyrelet', folder_name='unnamed_folder', prefix='', comment='', avg_counter=0):
+def generate_data_name(params, dataset_name='unnamed_spyrelet', folder_name='unnamed_folder', prefix='', comment='', avg_counter=0, extension='.json'):
     # import params
     path_name = params['nspyre_path']
     save_path_name = params['save_path']
@@ -125,7 +130,7 @@ def generate_data_name(params, dataset_name='unnamed_spyrelet', folder_name='unn
         os.makedirs(path)
 
     # name of file to be saved
-    path_and_name = path + '\\' + file_name + '.json'
+    path_and_name = path + '\\' + file_name + extension
 
     # save text file with path and name, to be used by plotting scripts
     last_path_and_name_file = params['nspyre_path'] + '\\Utility\\Saving\\last_path_and_name.txt'
@@ -0,0 +1,201 @@
+import numpy as np
+import json
+import os
+
+# h5py is optional, only needed for '.h5' checkpoints
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# checkpoints stream sweep data to disk while the sweep is running, so that a crashed or killed sweep can be resumed
+#   static arrays (e.g. x, y) are written once
+#   streams are resizable on-disk arrays, completed rows are appended in O(row) time
+#   state is a small dictionary (e.g. y_idx) rewritten after each row
+#   mode='a' reopens an existing checkpoint to resume a sweep, dropping any partially written row
+# two formats are supported:
+#   '.ckpt': folder with one raw binary file per stream, needs only numpy (default)
+#   '.h5':   HDF5 file with one chunked, resizable dataset per stream
+HEADER_FILE = 'checkpoint.json'
+
+class RawCheckpoint():
+    extension = '.ckpt'
+
+    def __init__(self, filename, mode='w'):
+        self.filename = filename
+        self.header = {'arrays': {}, 'streams': {}, 'state': {}}
+        self.files = {}
+
+        if mode == 'a':
+            with open(os.path.join(self.filename, HEADER_FILE)) as f:
+                self.header = json.load(f)
+            for name, info in self.header['streams'].items():
+                path = os.path.join(self.filename, name + '.bin')
+                row_bytes = int(np.prod(info['row_shape'])) * np.dtype(info['dtype']).itemsize
+                rows = os.path.getsize(path) // row_bytes if row_bytes > 0 else 0
+                self.files[name] = open(path, 'r+b')
+                self.files[name].truncate(rows * row_bytes)
+                self.files[name].seek(0, os.SEEK_END)
+        elif not os.path.exists(self.filename):
+            os.makedirs(self.filename)
+        self.write_header()
+
+    def write_header(self):
+        # write to a temporary file first, so the header on disk is always complete
+        path = os.path.join(self.filename, HEADER_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.header, f)
+        os.replace(path + '.tmp', path)
+
+    def write_array(self, name, arr):
+        arr = np.asarray(arr)
+        np.save(os.path.join(self.filename, name + '.npy'), arr, allow_pickle=False)
+        self.header['arrays'][name] = name + '.npy'
+        self.write_header()
+
+    def create_stream(self, name, row_shape, dtype=np.float64):
+        self.header['streams'][name] = {'row_shape': list(row_shape), 'dtype': np.dtype(dtype).str}
+        self.files[name] = open(os.path.join(self.filename, name + '.bin'), 'wb')
+        self.write_header()
+
+    def append(self, name, row):
+        # the number of rows is given by the file size, so only complete rows are ever counted
+        info = self.header['streams'][name]
+        row = np.ascontiguousarray(row, dtype=info['dtype']).reshape(info['row_shape'])
+        f = self.files[name]
+        f.write(row.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+    def truncate(self, name, rows):
+        # drop all rows of a stream after the first rows, e.g. to keep several streams the same length
+        info = self.header['streams'][name]
+        row_bytes = int(np.prod(info['row_shape'])) * np.dtype(info['dtype']).itemsize
+        f = self.files[name]
+        f.truncate(min(rows * row_bytes, f.seek(0, os.SEEK_END)))
+        f.seek(0, os.SEEK_END)
+
+    def set_state(self, **state):
+        self.header['state'].update(state)
+        self.write_header()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class HDF5Checkpoint():
+    extension = '.h5'
+
+    def __init__(self, filename, mode='w'):
+        if h5py is None:
+            raise ImportError('h5py is required for ".h5" checkpoints, install with "conda install h5py".')
+        self.filename = filename
+        self.state = {}
+        self.file = h5py.File(self.filename, mode)
+
+        if mode == 'a':
+            self.state = json.loads(self.file.attrs['state'])
+            for name in self.file:
+                if self.file[name].attrs.get('stream', False):
+                    self.file[name].resize(self.file[name].attrs['rows'], axis=0)
+        self.file.attrs['state'] = json.dumps(self.state)
+
+    def write_array(self, name, arr):
+        self.file.create_dataset(name, data=np.asarray(arr))
+        self.file.flush()
+
+    def create_stream(self, name, row_shape, dtype=np.float64):
+        row_shape = tuple(row_shape)
+        dset = self.file.create_dataset(
+            name,
+            shape=(0,) + row_shape,
+            maxshape=(None,) + row_shape,
+            chunks=(1,) + row_shape,
+            dtype=dtype,
+            )
+        dset.attrs['stream'] = True
+        dset.attrs['rows'] = 0
+        self.file.flush()
+
+    def append(self, name, row):
+        dset = self.file[name]
+        n = dset.attrs['rows']
+        dset.resize(n + 1, axis=0)
+        dset[n] = row
+        dset.attrs['rows'] = n + 1
+        self.file.flush()
+
+    def truncate(self, name, rows):
+        # drop all rows of a stream after the first rows, e.g. to keep several streams the same length
+        dset = self.file[name]
+        rows = min(rows, dset.attrs['rows'])
+        dset.resize(rows, axis=0)
+        dset.attrs['rows'] = rows
+        self.file.flush()
+
+    def set_state(self, **state):
+        self.state.update(state)
+        self.file.attrs['state'] = json.dumps(self.state)
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+CHECKPOINT_FORMATS = {
+    RawCheckpoint.extension: RawCheckpoint,
+    HDF5Checkpoint.extension: HDF5Checkpoint,
+    }
+
+def open_checkpoint(filename, mode='w'):
+    # create a new checkpoint (mode='w') or reopen one to resume (mode='a'), format is chosen from the file extension
+    extension = os.path.splitext(filename)[1].lower()
+    try:
+        checkpoint_class = CHECKPOINT_FORMATS[extension]
+    except KeyError:
+        raise ValueError('unknown checkpoint extension "' + extension + '", supported: ' + ', '.join(CHECKPOINT_FORMATS))
+    return checkpoint_class(filename, mode=mode)
+
+def load_checkpoint(filename):
+    # load static arrays, completed rows of every stream, and the last saved state
+    checkpoint = {'arrays': {}, 'streams': {}, 'state': {}}
+
+    if os.path.splitext(filename)[1].lower() == HDF5Checkpoint.extension:
+        if h5py is None:
+            raise ImportError('h5py is required for ".h5" checkpoints, install with "conda install h5py".')
+        with h5py.File(filename, 'r') as f:
+            checkpoint['state'] = json.loads(f.attrs['state'])
+            for name in f:
+                if f[name].attrs.get('stream', False):
+                    checkpoint['streams'][name] = f[name][:f[name].attrs['rows']]
+                else:
+                    checkpoint['arrays'][name] = f[name][()]
+        return checkpoint
+
+    with open(os.path.join(filename, HEADER_FILE)) as f:
+        header = json.load(f)
+    checkpoint['state'] = header['state']
+    for name, array_file in header['arrays'].items():
+        checkpoint['arrays'][name] = np.load(os.path.join(filename, array_file), allow_pickle=False)
+    for name, info in header['streams'].items():
+        # a row that was only partially written when the sweep crashed is dropped
+        data = np.fromfile(os.path.join(filename, name + '.bin'), dtype=info['dtype'])
+        row_size = int(np.prod(info['row_shape']))
+        rows = data.size // row_size if row_size > 0 else 0
+        checkpoint['streams'][name] = data[:rows*row_size].reshape([rows] + info['row_shape'])
+    return checkpoint
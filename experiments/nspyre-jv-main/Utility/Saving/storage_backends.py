@@ -0,0 +1,176 @@
+import numpy as np
+import json
+import os
+
+# h5py is optional, only needed for the 'hdf5' backend
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# storage backends used by autosave_data and load_dataset
+#   'npz':  uncompressed numpy archive, arrays keep dtype and shape (default)
+#   'hdf5': chunked HDF5 file, arrays keep dtype and shape, params stored as attributes
+#   'json': legacy format, arrays converted to lists
+DEFAULT_SAVE_FORMAT = 'npz'
+
+# name of entries used to store things that are not plain arrays
+PARAMS_KEY = '__params__'
+JSON_KEY = '__json__'
+
+def json_default(obj):
+    # make numpy objects json serializable
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    return str(obj)
+
+def to_native_array(val):
+    # return val as a non-object numpy array, or None if it can't be stored natively
+    if isinstance(val, (dict, type(None))):
+        return None
+    try:
+        arr = np.asarray(val)
+    except Exception:
+        return None
+    if arr.dtype.kind not in 'biufcUS':
+        return None
+    return arr
+
+def from_native_array(arr):
+    # 0d arrays are given back as python scalars, everything else stays an array
+    if arr.ndim == 0:
+        return arr.item()
+    return arr
+
+class JSONBackend():
+    extension = '.json'
+
+    def save(self, filename, dataset, params):
+        dataset_serialized = dict(dataset)
+        dataset_serialized['params'] = params
+        with open(filename, 'w') as df:
+            json.dump(dataset_serialized, df, default=json_default)
+
+    def load(self, filename):
+        with open(filename) as df:
+            return json.load(df)
+
+class NPZBackend():
+    extension = '.npz'
+
+    def save(self, filename, dataset, params):
+        arrays = {}
+        other = {}
+        for key, val in dataset.items():
+            arr = to_native_array(val)
+            if arr is None:
+                other[key] = val
+            else:
+                arrays[key] = arr
+
+        # npz has no attributes, so params and non-array values are stored as json strings
+        arrays[PARAMS_KEY] = np.array(json.dumps(params, default=json_default))
+        arrays[JSON_KEY] = np.array(json.dumps(other, default=json_default))
+
+        with open(filename, 'wb') as df:
+            np.savez(df, **arrays)
+
+    def load(self, filename):
+        dataset = {}
+        with np.load(filename, allow_pickle=False) as npz:
+            for key in npz.files:
+                if key == PARAMS_KEY:
+                    dataset['params'] = json.loads(str(npz[key]))
+                elif key == JSON_KEY:
+                    dataset.update(json.loads(str(npz[key])))
+                else:
+                    dataset[key] = from_native_array(npz[key])
+        return dataset
+
+class HDF5Backend():
+    extension = '.h5'
+
+    def __init__(self, chunks=True):
+        if h5py is None:
+            raise ImportError('h5py is required for the "hdf5" save format, install with "conda install h5py".')
+        self.chunks = chunks
+
+    def write_attrs(self, attrs, values):
+        # scalars and strings are stored as attributes directly, everything else as json
+        json_keys = []
+        for key, val in values.items():
+            if isinstance(val, (str, bool, int, float, np.generic)):
+                attrs[key] = val
+            else:
+                attrs[key] = json.dumps(val, default=json_default)
+                json_keys.append(key)
+        attrs[JSON_KEY] = json.dumps(json_keys)
+
+    def read_attrs(self, attrs):
+        json_keys = json.loads(attrs.get(JSON_KEY, '[]'))
+        values = {}
+        for key, val in attrs.items():
+            if key == JSON_KEY:
+                continue
+            if key in json_keys:
+                values[key] = json.loads(val)
+            elif isinstance(val, np.generic):
+                values[key] = val.item()
+            else:
+                values[key] = val
+        return values
+
+    def save(self, filename, dataset, params):
+        with h5py.File(filename, 'w') as f:
+            other = {}
+            for key, val in dataset.items():
+                arr = to_native_array(val)
+                if arr is None or arr.ndim == 0:
+                    other[key] = val
+                elif arr.dtype.kind == 'U':
+                    # h5py doesn't support numpy unicode arrays
+                    f.create_dataset(key, data=arr.astype(h5py.string_dtype()))
+                else:
+                    chunks = self.chunks if arr.size > 0 else None
+                    f.create_dataset(key, data=arr, chunks=chunks)
+            self.write_attrs(f.attrs, other)
+            self.write_attrs(f.create_group('params').attrs, params)
+
+    def load(self, filename):
+        dataset = {}
+        with h5py.File(filename, 'r') as f:
+            for key in f:
+                if key == 'params':
+                    dataset['params'] = self.read_attrs(f[key].attrs)
+                elif f[key].dtype.kind == 'O':
+                    dataset[key] = f[key].asstr()[()]
+                else:
+                    dataset[key] = f[key][()]
+            dataset.update(self.read_attrs(f.attrs))
+        return dataset
+
+BACKENDS = {
+    'json': JSONBackend,
+    'npz': NPZBackend,
+    'hdf5': HDF5Backend,
+    }
+
+def get_backend(save_format=DEFAULT_SAVE_FORMAT):
+    try:
+        return BACKENDS[save_format]()
+    except KeyError:
+        raise ValueError('unknown save format "' + str(save_format) + '", supported: ' + ', '.join(BACKENDS))
+
+def get_backend_for_file(filename):
+    # pick the backend from the file extension
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.h5', '.hdf5'):
+        return get_backend('hdf5')
+    for save_format, backend in BACKENDS.items():
+        if backend.extension == extension:
+            return get_backend(save_format)
+    raise ValueError('unknown file extension "' + extension + '" for ' + str(filename))
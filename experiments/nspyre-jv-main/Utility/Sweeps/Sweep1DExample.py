@@ -12,6 +12,9 @@ sys.path.insert(0,r'{}'.format(path_name))
 sys.path.insert(0,r'{}\Utility\Sweeps'.format(path_name))
 sys.path.insert(0,r'{}\Utility\Saving'.format(path_name))
 from autosave_functions import *
+from checkpoint_functions import open_checkpoint, load_checkpoint
+from data_publisher import DataPublisher
+from running_stats import RunningStats
 
 class Sweep1DExample():
     def __init__(self, params):
@@ -24,7 +27,10 @@ class Sweep1DExample():
             'z_label': 'counts/s', \
         }
 
-    def run(self, X, Z, inf_loop=False, save_each_sweep=False):
+    def run(self, X, Z, inf_loop=False, save_each_sweep=False, checkpoint_file=None, resume_from=None):
+        # checkpoint_file: optional path ('.ckpt' or '.h5'), each measured point is appended to it during the sweep
+        # resume_from: optional checkpoint of an unfinished sweep, the measured points are replayed and skipped
+        #   the checkpoint is continued in place unless a different checkpoint_file is given
         # define sweep parameters, including defaults if not otherwise set
         x = X.x
         try:
@@ -46,15 +52,26 @@ class Sweep1DExample():
 
         with DataSource(self.params['data']) as data:
 
+            # rate limited pushes of the changed data only, see data_publisher.py
+            publisher = DataPublisher(
+                data,
+                max_rate=self.params.get('max_push_rate', 20),
+                delta=self.params.get('push_deltas', True),
+                )
+
             print('initializing 1d sweep...')
 
-            counts_per_s_ch0 = np.zeros(len(x))
+            # running mean and standard error of each point, updated in place
+            stats_ch0 = RunningStats(len(x))
+            counts_per_s_ch0 = stats_ch0.mean
+            counts_per_s_ch0_sem = stats_ch0.sem
             counts_per_s_ch0_last = np.zeros(len(x))
 
             avg_x_counter = 0
             dataset = {
                 'x':x,
                 'z_ch0':counts_per_s_ch0,
+                'z_ch0_sem':counts_per_s_ch0_sem,
                 'z_ch0_last':counts_per_s_ch0_last,
                 'x_idx':0,
                 'x_label':x_label,
@@ -66,60 +83,125 @@ class Sweep1DExample():
                 counts_per_s_ch0_all = np.zeros((len(x),x_avg))
                 dataset['z_ch0_all'] = counts_per_s_ch0_all
 
-            data.push(dataset)
-
-            print('sweeping...')
-            sweep_start_time = time.time()
-            continue_sweeping = 1
-
-            while continue_sweeping == 1:
-                while avg_x_counter+1 <= x_avg:
-                    for x_idx, x_val in enumerate(x):
-
-                        # x
-                        X.set_x(x_idx, x_val)
-
-                        # record data
-                        data_val = ctrs_rate = Z.get_z()
-
-                        if avg_x_counter == 0:
-                            counts_per_s_ch0[x_idx] = data_val
-                        elif avg_x_counter > 0:
-                            counts_per_s_ch0[x_idx] = (data_val + avg_x_counter*counts_per_s_ch0.tolist()[x_idx])/(avg_x_counter+1)
-
-                        # save value of last sweep, for plotting compared to average
-                        counts_per_s_ch0_last[x_idx] =  data_val
-
-                        # save the current data to the data server
-                        dataset['x_idx'] = x_idx
-                        dataset['avg_x_counter'] = avg_x_counter
-                        if save_each_sweep == True:
-                            counts_per_s_ch0_all[x_idx,avg_x_counter] = data_val
-
-                        data.push(dataset)
-
-                        try:
-                            x_idx_10pct = round(len(x) / 10)
-                        except:
-                            x_idx_10pct = 1
-
-                        if self.print_x_progress == True:
-                            if x_idx_10pct > 0:
-                                if x_idx % x_idx_10pct == 0:
-                                    print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
-                            else:
-                                print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
-
-                    avg_x_counter = avg_x_counter + 1
-                    self.params['avg_x_counter'] = avg_x_counter
-                    if x_avg > 1:
-                        this_time = round(time.time() - sweep_start_time,3)
-                        print('averaging ' + str(avg_x_counter) + ' of ' + str(x_avg) + ' sweeps, ' + str(this_time) + ' s')
-                if inf_loop == True:
-                    print('infinite loop enabled')
-                    avg_x_counter = 0
+            # replay the points measured in a previous, unfinished sweep
+            x_idx_start = 0
+            points = np.zeros((0,3))
+            if resume_from is not None:
+                print('resuming from: ' + str(resume_from))
+                previous = load_checkpoint(resume_from)
+                if len(previous['arrays']['x']) != len(x):
+                    raise ValueError('checkpoint has ' + str(len(previous['arrays']['x'])) + ' x points, sweep has ' + str(len(x)))
+                points = previous['streams']['z_ch0_points']
+                for x_idx, avg_x_counter, data_val in points:
+                    x_idx = int(x_idx)
+                    avg_x_counter = int(avg_x_counter)
+                    if avg_x_counter == 0:
+                        stats_ch0.reset(x_idx)
+                    stats_ch0.update(x_idx, data_val)
+                    counts_per_s_ch0_last[x_idx] = data_val
+                    if save_each_sweep == True and avg_x_counter < x_avg:
+                        counts_per_s_ch0_all[x_idx,avg_x_counter] = data_val
+                    dataset['x_idx'] = x_idx
+                    dataset['avg_x_counter'] = avg_x_counter
+
+                # continue with the point after the last one measured
+                if len(points) > 0:
+                    x_idx_start = x_idx + 1
+                    if x_idx_start == len(x):
+                        x_idx_start = 0
+                        avg_x_counter = avg_x_counter + 1
+                self.params['avg_x_counter'] = avg_x_counter
+                print('restored ' + str(len(points)) + ' points, resuming at x point ' + str(x_idx_start+1) + ' of sweep ' + str(avg_x_counter+1))
+                if checkpoint_file is None:
+                    checkpoint_file = resume_from
+
+            publisher.flush(dataset)
+
+            # stream measured points to disk, so that a crashed sweep can be resumed
+            checkpoint = None
+            if checkpoint_file is not None:
+                print('checkpointing to: ' + str(checkpoint_file))
+                if checkpoint_file == resume_from:
+                    checkpoint = open_checkpoint(checkpoint_file, mode='a')
                 else:
-                    continue_sweeping = 0
+                    checkpoint = open_checkpoint(checkpoint_file)
+                    checkpoint.write_array('x', x)
+                    checkpoint.create_stream('z_ch0_points', (3,)) # x_idx, avg_x_counter, data_val
+                    for point in points:
+                        checkpoint.append('z_ch0_points', point)
+                checkpoint.set_state(x_label=x_label, z_label=z_label)
+
+            try:
+                print('sweeping...')
+                sweep_start_time = time.time()
+                continue_sweeping = 1
+
+                while continue_sweeping == 1:
+                    while avg_x_counter+1 <= x_avg:
+                        for x_idx, x_val in enumerate(x):
+
+                            # skip points restored from a checkpoint
+                            if x_idx < x_idx_start:
+                                continue
+
+                            # x
+                            X.set_x(x_idx, x_val)
+
+                            # record data
+                            data_val = ctrs_rate = Z.get_z()
+
+                            # running mean and standard error, a new average starts with the first sweep
+                            if avg_x_counter == 0:
+                                stats_ch0.reset(x_idx)
+                            stats_ch0.update(x_idx, data_val)
+
+                            # save value of last sweep, for plotting compared to average
+                            counts_per_s_ch0_last[x_idx] =  data_val
+
+                            # save the current data to the data server
+                            dataset['x_idx'] = x_idx
+                            dataset['avg_x_counter'] = avg_x_counter
+                            if save_each_sweep == True:
+                                counts_per_s_ch0_all[x_idx,avg_x_counter] = data_val
+
+                            if checkpoint is not None:
+                                checkpoint.append('z_ch0_points', [x_idx, avg_x_counter, data_val])
+
+                            changed = {'z_ch0': x_idx, 'z_ch0_sem': x_idx, 'z_ch0_last': x_idx}
+                            if save_each_sweep == True:
+                                changed['z_ch0_all'] = (x_idx, avg_x_counter)
+                            publisher.push(dataset, changed)
+
+                            try:
+                                x_idx_10pct = round(len(x) / 10)
+                            except:
+                                x_idx_10pct = 1
+
+                            if self.print_x_progress == True:
+                                if x_idx_10pct > 0:
+                                    if x_idx % x_idx_10pct == 0:
+                                        print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
+                                else:
+                                    print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
+
+                        x_idx_start = 0
+                        avg_x_counter = avg_x_counter + 1
+                        self.params['avg_x_counter'] = avg_x_counter
+                        if x_avg > 1:
+                            this_time = round(time.time() - sweep_start_time,3)
+                            print('averaging ' + str(avg_x_counter) + ' of ' + str(x_avg) + ' sweeps, ' + str(this_time) + ' s')
+                    if inf_loop == True:
+                        print('infinite loop enabled')
+                        avg_x_counter = 0
+                    else:
+                        continue_sweeping = 0
+            finally:
+                # also on an error or interrupt, so that the file can be reopened to resume
+                if checkpoint is not None:
+                    checkpoint.close()
+
+            # make sure the last points are published
+            publisher.flush(dataset)
 
             print('sweep finished, total sweep time is: ' + str(round(time.time() - sweep_start_time,3)) + ' s')
 
@@ -12,6 +12,9 @@ sys.path.insert(0,r'{}'.format(path_name))
 sys.path.insert(0,r'{}\Utility\Sweeps'.format(path_name))
 sys.path.insert(0,r'{}\Utility\Saving'.format(path_name))
 from autosave_functions import *
+from checkpoint_functions import open_checkpoint, load_checkpoint
+from data_publisher import DataPublisher
+from running_stats import RunningStats
 
 class Sweep2DExample():
     def __init__(self, params):
@@ -25,7 +28,10 @@ class Sweep2DExample():
             'z_label': 'counts/s', \
         }
 
-    def run(self, X, Y, Z, save_each_sweep=False):
+    def run(self, X, Y, Z, save_each_sweep=False, checkpoint_file=None, resume_from=None):
+        # checkpoint_file: optional path ('.ckpt' or '.h5'), each completed y row is appended to it during the sweep
+        # resume_from: optional checkpoint of an unfinished sweep, completed y rows are restored and skipped
+        #   the checkpoint is continued in place unless a different checkpoint_file is given
 
         # define sweep parameters, including defaults if not otherwise set
         x = X.x
@@ -64,11 +70,22 @@ class Sweep2DExample():
 
         with DataSource(self.params['data']) as data:
 
+            # rate limited pushes of the changed data only, see data_publisher.py
+            publisher = DataPublisher(
+                data,
+                max_rate=self.params.get('max_push_rate', 20),
+                delta=self.params.get('push_deltas', True),
+                )
+
             print('initializing 2d sweep...')
 
-            counts_per_s_ch0 = np.zeros(len(x))
+            # running mean and standard error of each point in the current y row, updated in place
+            stats_ch0 = RunningStats(len(x))
+            counts_per_s_ch0 = stats_ch0.mean
+            counts_per_s_ch0_sem = stats_ch0.sem
             counts_per_s_ch0_last = np.zeros(len(x))
             counts_per_s_ch0_arr = np.zeros([len(x), len(y)])
+            counts_per_s_ch0_sem_arr = np.zeros([len(x), len(y)])
 
             avg_x_counter = 0
             avg_y_counter = 0
@@ -76,8 +93,10 @@ class Sweep2DExample():
                 'x':x,
                 'y':y,
                 'z_ch0':counts_per_s_ch0,
+                'z_ch0_sem':counts_per_s_ch0_sem,
                 'z_ch0_last':counts_per_s_ch0_last,
                 'z_ch0_arr':counts_per_s_ch0_arr,
+                'z_ch0_sem_arr':counts_per_s_ch0_sem_arr,
                 'x_idx':0,
                 'y_idx':0,
                 'x_label':x_label,
@@ -91,75 +110,145 @@ class Sweep2DExample():
                 counts_per_s_ch0_all = np.zeros((len(x),x_avg))
                 dataset['z_ch0_all'] = counts_per_s_ch0_all
 
-            data.push(dataset)
-
-            print('sweeping...')
-            sweep_start_time = time.time()
-
-            for y_idx, y_val in enumerate(y):
-
-                # y
-                Y.set_y(y_idx, y_val)
-                time.sleep(y_pause)
-
-                avg_x_counter = 0
-                while avg_x_counter+1 <= x_avg:
-                    for x_idx, x_val in enumerate(x):
-
-                        # x
-                        X.set_x(x_idx, x_val)
-
-                        # record data
-                        data_val = ctrs_rate = Z.get_z()
-
-                        if avg_x_counter == 0:
-                            counts_per_s_ch0[x_idx] = data_val
-                        elif avg_x_counter > 0:
-                            counts_per_s_ch0[x_idx] = (data_val + avg_x_counter*counts_per_s_ch0[x_idx])/(avg_x_counter+1)
+            # restore completed y rows from a previous, unfinished sweep
+            y_idx_start = 0
+            if resume_from is not None:
+                print('resuming from: ' + str(resume_from))
+                previous = load_checkpoint(resume_from)
+                rows = previous['streams']['z_ch0_arr']
+                sem_rows = previous['streams']['z_ch0_sem_arr']
+                if rows.shape[1] != len(x) or rows.shape[0] > len(y):
+                    raise ValueError('checkpoint shape ' + str(rows.shape) + ' does not match sweep of ' + str(len(y)) + ' x ' + str(len(x)) + ' points')
+                # a row is complete once both streams have it
+                y_idx_start = min(len(rows), len(sem_rows))
+                counts_per_s_ch0_arr[:,:y_idx_start] = np.transpose(rows[:y_idx_start])
+                counts_per_s_ch0_sem_arr[:,:y_idx_start] = np.transpose(sem_rows[:y_idx_start])
+                if y_idx_start > 0:
+                    counts_per_s_ch0[:] = counts_per_s_ch0_arr[:,y_idx_start-1]
+                    counts_per_s_ch0_sem[:] = counts_per_s_ch0_sem_arr[:,y_idx_start-1]
+                    counts_per_s_ch0_last[:] = counts_per_s_ch0
+                    avg_x_counter = x_avg
+                    dataset['x_idx'] = len(x) - 1
+                    dataset['y_idx'] = y_idx_start - 1
+                    dataset['avg_x_counter'] = avg_x_counter
+                print('restored ' + str(y_idx_start) + ' out of ' + str(len(y)) + ' y rows')
+                if checkpoint_file is None:
+                    checkpoint_file = resume_from
+
+            publisher.flush(dataset)
+
+            # stream completed rows to disk, so that a crashed sweep can be resumed
+            checkpoint = None
+            if checkpoint_file is not None:
+                print('checkpointing to: ' + str(checkpoint_file))
+                if checkpoint_file == resume_from:
+                    checkpoint = open_checkpoint(checkpoint_file, mode='a')
+                    # keep only the rows that were restored
+                    checkpoint.truncate('z_ch0_arr', y_idx_start)
+                    checkpoint.truncate('z_ch0_sem_arr', y_idx_start)
+                else:
+                    checkpoint = open_checkpoint(checkpoint_file)
+                    checkpoint.write_array('x', x)
+                    checkpoint.write_array('y', y)
+                    checkpoint.create_stream('z_ch0_arr', (len(x),))
+                    checkpoint.create_stream('z_ch0_sem_arr', (len(x),))
+                    for y_idx in range(y_idx_start):
+                        checkpoint.append('z_ch0_arr', counts_per_s_ch0_arr[:,y_idx])
+                        checkpoint.append('z_ch0_sem_arr', counts_per_s_ch0_sem_arr[:,y_idx])
+                checkpoint.set_state(x_label=x_label, y_label=y_label, z_label=z_label, y_idx=y_idx_start-1)
+
+            try:
+                print('sweeping...')
+                sweep_start_time = time.time()
+
+                for y_idx, y_val in enumerate(y):
+
+                    # skip rows restored from a checkpoint
+                    if y_idx < y_idx_start:
+                        continue
+
+                    # y
+                    Y.set_y(y_idx, y_val)
+                    time.sleep(y_pause)
+
+                    avg_x_counter = 0
+                    while avg_x_counter+1 <= x_avg:
+                        for x_idx, x_val in enumerate(x):
+
+                            # x
+                            X.set_x(x_idx, x_val)
+
+                            # record data
+                            data_val = ctrs_rate = Z.get_z()
+
+                            # running mean and standard error, a new average starts with the first sweep of each row
+                            if avg_x_counter == 0:
+                                stats_ch0.reset(x_idx)
+                            stats_ch0.update(x_idx, data_val)
 
                             # update 2d array
-                        counts_per_s_ch0_arr[:,y_idx] = counts_per_s_ch0
-
-                        # if avg_x_counter == 0:
-                        #     counts_per_s_ch0[x_idx] = data_val
-                        # elif avg_x_counter > 0:
-                        #     counts_per_s_ch0[x_idx] = (data_val + avg_x_counter*counts_per_s_ch0.tolist()[x_idx])/(avg_x_counter+1)
-
-                        # save value of last sweep, for plotting compared to average
-                        counts_per_s_ch0_last[x_idx] =  data_val
-
-                        # save the current data to the data server
-                        dataset['x_idx'] = x_idx
-                        dataset['avg_x_counter'] = avg_x_counter
-                        if save_each_sweep == True:
-                            counts_per_s_ch0_all[x_idx,avg_x_counter] = data_val
+                            counts_per_s_ch0_arr[:,y_idx] = counts_per_s_ch0
+                            counts_per_s_ch0_sem_arr[:,y_idx] = counts_per_s_ch0_sem
+
+                            # if avg_x_counter == 0:
+                            #     counts_per_s_ch0[x_idx] = data_val
+                            # elif avg_x_counter > 0:
+                            #     counts_per_s_ch0[x_idx] = (data_val + avg_x_counter*counts_per_s_ch0.tolist()[x_idx])/(avg_x_counter+1)
+
+                            # save value of last sweep, for plotting compared to average
+                            counts_per_s_ch0_last[x_idx] =  data_val
+
+                            # save the current data to the data server
+                            dataset['x_idx'] = x_idx
+                            dataset['avg_x_counter'] = avg_x_counter
+                            if save_each_sweep == True:
+                                counts_per_s_ch0_all[x_idx,avg_x_counter] = data_val
+
+                            if x_idx == 0 and avg_x_counter == 0:
+                                # the whole y column of z_ch0_arr is overwritten at the start of each row
+                                changed = None
+                            else:
+                                changed = {'z_ch0': x_idx, 'z_ch0_sem': x_idx, 'z_ch0_last': x_idx, 'z_ch0_arr': (x_idx, y_idx), 'z_ch0_sem_arr': (x_idx, y_idx)}
+                                if save_each_sweep == True:
+                                    changed['z_ch0_all'] = (x_idx, avg_x_counter)
+                            publisher.push(dataset, changed)
+
+                            try:
+                                x_idx_10pct = round(len(x) / 10)
+                            except:
+                                x_idx_10pct = 1
+
+                            if self.print_x_progress == True:
+                                if x_idx_10pct > 0:
+                                    if x_idx % x_idx_10pct == 0:
+                                        print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
+                                else:
+                                    print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
 
-                        data.push(dataset)
+                        avg_x_counter = avg_x_counter + 1
+                        self.params['avg_x_counter'] = avg_x_counter
+                        if x_avg > 1:
+                            this_time = round(time.time() - sweep_start_time,3)
+                            print('averaging ' + str(avg_x_counter) + ' of ' + str(x_avg) + ' sweeps, ' + str(this_time) + ' s')
 
-                        try:
-                            x_idx_10pct = round(len(x) / 10)
-                        except:
-                            x_idx_10pct = 1
+                    dataset['y_idx'] = y_idx
+                    dataset['avg_y_counter'] = avg_y_counter
 
-                        if self.print_x_progress == True:
-                            if x_idx_10pct > 0:
-                                if x_idx % x_idx_10pct == 0:
-                                    print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
-                            else:
-                                print('completed x data ' + str(x_idx+1) + ' out of ' + str(len(x)))
+                    if checkpoint is not None:
+                        checkpoint.append('z_ch0_arr', counts_per_s_ch0_arr[:,y_idx])
+                        checkpoint.append('z_ch0_sem_arr', counts_per_s_ch0_sem_arr[:,y_idx])
+                        checkpoint.set_state(y_idx=y_idx)
 
-                    avg_x_counter = avg_x_counter + 1
-                    self.params['avg_x_counter'] = avg_x_counter
-                    if x_avg > 1:
+                    if self.print_y_progress == True:
                         this_time = round(time.time() - sweep_start_time,3)
-                        print('averaging ' + str(avg_x_counter) + ' of ' + str(x_avg) + ' sweeps, ' + str(this_time) + ' s')
-
-                dataset['y_idx'] = y_idx
-                dataset['avg_y_counter'] = avg_y_counter
-
-                if self.print_y_progress == True:
-                    this_time = round(time.time() - sweep_start_time,3)
-                    print('completed y data ' + str(y_idx+1) + ' out of ' + str(len(y)) + ', ' + str(this_time) + ' s')
+                        print('completed y data ' + str(y_idx+1) + ' out of ' + str(len(y)) + ', ' + str(this_time) + ' s')
+            finally:
+                # also on an error or interrupt, so that the file can be reopened to resume
+                if checkpoint is not None:
+                    checkpoint.close()
+
+            # make sure the last points are published
+            publisher.flush(dataset)
 
             print('sweep finished, total sweep time is: ' + str(round(time.time() - sweep_start_time,3)) + ' s')
 
@@ -0,0 +1,128 @@
+import numpy as np
+import time
+
+# publishing of sweep data to the nspyre data server
+#   DataPublisher wraps a DataSource in the sweep process:
+#       pushes are rate limited to max_rate (Hz), changes between pushes are accumulated
+#       pushes only send the changed slice of each array (delta), instead of pickling the full arrays
+#       a delta holds all the changes since the last full push, so a sink which missed deltas (e.g. a slow GUI,
+#           the data server only keeps the latest push) is up to date again with the next delta it gets
+#       a full push is sent every full_period (s), which bounds the size of the deltas, and so that a sink
+#           which missed a full push recovers
+#   DataReassembler is used on the DataSink side, it rebuilds the full dataset from full and delta pushes
+#   datasets pushed directly to a DataSource (without a DataPublisher) are passed through unchanged
+PUBLISH_KEY = '_publish'
+SLICES_KEY = '_slices'
+
+class DataPublisher():
+
+    def __init__(self, data, max_rate=20, full_period=2, delta=True):
+        self.data = data
+        self.max_rate = max_rate
+        self.full_period = full_period
+        self.delta = delta
+
+        self.seq = 0
+        self.full_seq = 0 # seq of the last full push, the base of the deltas
+        self.last_push_time = 0
+        self.last_full_time = 0
+        self.pending = {}
+        self.full_pending = True
+
+    def push(self, dataset, changed=None):
+        # changed: dictionary of {key: index} of the array elements updated since the last call,
+        #   index is an int for 1d arrays or a tuple for nd arrays
+        #   None if it's not known what changed, so that the next push is a full push
+        if changed is None:
+            self.full_pending = True
+        else:
+            for key, idx in changed.items():
+                self.pending.setdefault(key, set()).add(idx)
+
+        # rate limit
+        now = time.time()
+        if self.max_rate and now - self.last_push_time < 1/self.max_rate:
+            return False
+
+        if self.full_pending or not self.delta or now - self.last_full_time >= self.full_period:
+            self.push_full(dataset)
+        else:
+            self.push_delta(dataset)
+        return True
+
+    def flush(self, dataset):
+        # push the full dataset right away, e.g. at the start and end of a sweep
+        self.push_full(dataset)
+
+    def push_full(self, dataset):
+        self.seq = self.seq + 1
+        message = dict(dataset)
+        message[PUBLISH_KEY] = {'seq': self.seq, 'full': True, 'base': self.seq}
+        self.data.push(message)
+
+        self.full_seq = self.seq
+        self.last_push_time = self.last_full_time = time.time()
+        self.pending = {}
+        self.full_pending = False
+
+    def push_delta(self, dataset):
+        self.seq = self.seq + 1
+        message = {PUBLISH_KEY: {'seq': self.seq, 'full': False, 'base': self.full_seq}}
+
+        # scalars (x_idx, y_idx, avg_x_counter, ...) are small, so always send them
+        for key, val in dataset.items():
+            if not isinstance(val, (np.ndarray, list, tuple, dict)):
+                message[key] = val
+
+        # array elements changed since the last full push, as (index, values)
+        #   pending is kept until the next full push, so that each delta is enough to catch up from the full push
+        slices = {}
+        for key, idx_set in self.pending.items():
+            idx = np.array(sorted(idx_set))
+            if idx.ndim > 1:
+                idx = tuple(np.transpose(idx))
+            slices[key] = (idx, np.asarray(dataset[key])[idx])
+        message[SLICES_KEY] = slices
+        self.data.push(message)
+
+        self.last_push_time = time.time()
+
+class DataReassembler():
+
+    def __init__(self):
+        self.dataset = None
+        self.seq = None
+        self.base = None # seq of the full push the dataset was built from
+        self.missed = 0 # number of pushes missed, for diagnostics
+
+    def apply(self, message):
+        # update the full dataset from a pushed message, returns True if the dataset is up to date
+        meta = message.get(PUBLISH_KEY)
+
+        # not published by a DataPublisher
+        if meta is None:
+            self.dataset = message
+            self.seq = None
+            self.base = None
+            return True
+
+        if self.seq is not None and meta['seq'] > self.seq + 1:
+            self.missed = self.missed + meta['seq'] - self.seq - 1
+        self.seq = meta['seq']
+
+        if meta['full']:
+            self.dataset = {key: val for key, val in message.items() if key != PUBLISH_KEY}
+            self.base = meta['seq']
+            return True
+
+        # a delta holds all the changes since its full push, so missed deltas don't matter,
+        #   but if that full push was missed, wait for the next one
+        if self.dataset is None or meta['base'] != self.base:
+            return False
+
+        for key, (idx, values) in message[SLICES_KEY].items():
+            self.dataset[key][idx] = values
+        for key, val in message.items():
+            if key not in (PUBLISH_KEY, SLICES_KEY):
+                self.dataset[key] = val
+        return True
@@ -0,0 +1,35 @@
+import numpy as np
+
+# running statistics of repeated measurements at each point of a sweep, using Welford's algorithm
+#   only the count, mean and sum of squared deviations (m2) are kept for each point, so memory is O(N) instead of O(N*avg)
+#   mean and standard error (sem) are arrays that are updated in place, so they can be put in a dataset directly
+class RunningStats():
+
+    def __init__(self, shape):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.sem = np.zeros(shape)
+
+    def update(self, idx, value):
+        # add a measurement at idx, idx and value can also be arrays of indices and values (without repeated indices)
+        self.count[idx] += 1
+        count = self.count[idx]
+        delta = value - self.mean[idx]
+        self.mean[idx] += delta / count
+        self.m2[idx] += delta * (value - self.mean[idx])
+        self.sem[idx] = np.sqrt(self.m2[idx] / np.maximum(count - 1, 1) / count)
+
+    def reset(self, idx=slice(None)):
+        # forget all measurements at idx (all points by default), the next update starts a new average
+        self.count[idx] = 0
+        self.mean[idx] = 0
+        self.m2[idx] = 0
+        self.sem[idx] = 0
+
+    def variance(self):
+        # sample variance, 0 where there are less than 2 measurements
+        return self.m2 / np.maximum(self.count - 1, 1)
+
+    def std(self):
+        return np.sqrt(self.variance())
@@ -0,0 +1,93 @@
+# tests of data_publisher.py, run with: python -m pytest test_data_publisher.py
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from data_publisher import DataPublisher, DataReassembler
+
+class ListSource():
+    # stands in for a DataSource, keeps the pushed messages
+    def __init__(self):
+        self.messages = []
+
+    def push(self, message):
+        self.messages.append(message)
+
+def make_sweep(n=10):
+    return {'x': np.arange(n, dtype=np.float64), 'y': np.full(n, np.nan), 'idx': -1}
+
+def test_deltas_rebuild_dataset():
+    source = ListSource()
+    publisher = DataPublisher(source, max_rate=0, full_period=1e9)
+    dataset = make_sweep()
+    publisher.flush(dataset)
+    for idx in range(len(dataset['x'])):
+        dataset['y'][idx] = idx**2
+        dataset['idx'] = idx
+        publisher.push(dataset, {'y': idx})
+
+    sink = DataReassembler()
+    for message in source.messages:
+        assert sink.apply(message)
+    assert np.array_equal(sink.dataset['y'], dataset['y'])
+    assert sink.dataset['idx'] == dataset['idx']
+    assert not any(message['_publish']['full'] for message in source.messages[1:])
+
+def test_missed_deltas_recover_with_next_delta():
+    # a slow sink only gets some of the pushes, it's up to date again with the next delta it gets
+    source = ListSource()
+    publisher = DataPublisher(source, max_rate=0, full_period=1e9)
+    dataset = make_sweep()
+    publisher.flush(dataset)
+    sink = DataReassembler()
+    assert sink.apply(source.messages[0])
+
+    for idx in range(len(dataset['x'])):
+        dataset['y'][idx] = idx**2
+        dataset['idx'] = idx
+        publisher.push(dataset, {'y': idx})
+        # the sink misses every push except every third one
+        if idx % 3 == 2:
+            assert sink.apply(source.messages[-1])
+            assert np.array_equal(sink.dataset['y'], dataset['y'], equal_nan=True)
+            assert sink.dataset['idx'] == idx
+    assert sink.missed > 0
+
+def test_missed_full_push_waits_for_next_full_push():
+    source = ListSource()
+    publisher = DataPublisher(source, max_rate=0, full_period=1e9)
+    dataset = make_sweep()
+    publisher.flush(dataset)
+    sink = DataReassembler()
+    assert sink.apply(source.messages[0])
+
+    # a full push (unknown changes) is missed, deltas based on it can't be applied
+    dataset['y'][:] = 1
+    publisher.push(dataset)
+    dataset['y'][0] = 2
+    publisher.push(dataset, {'y': 0})
+    assert not sink.apply(source.messages[-1])
+
+    # until the next full push
+    dataset['y'][1] = 3
+    publisher.push(dataset)
+    assert sink.apply(source.messages[-1])
+    dataset['y'][2] = 4
+    publisher.push(dataset, {'y': 2})
+    assert sink.apply(source.messages[-1])
+    assert np.array_equal(sink.dataset['y'], dataset['y'])
+
+def test_2d_deltas():
+    source = ListSource()
+    publisher = DataPublisher(source, max_rate=0, full_period=1e9)
+    dataset = {'z': np.zeros((3, 4))}
+    publisher.flush(dataset)
+    sink = DataReassembler()
+    sink.apply(source.messages[0])
+    dataset['z'][1, 2] = 5
+    publisher.push(dataset, {'z': (1, 2)})
+    dataset['z'][2, 0] = 7
+    publisher.push(dataset, {'z': (2, 0)})
+    assert sink.apply(source.messages[-1])
+    assert np.array_equal(sink.dataset['z'], dataset['z'])
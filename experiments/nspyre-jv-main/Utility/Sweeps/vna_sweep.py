@@ -0,0 +1,170 @@
+import numpy as np
+import time
+
+from checkpoint_functions import open_checkpoint
+from data_publisher import DataPublisher
+
+# vna sweeps over an external parameter and/or the VNA power, with e5071c.E5071C
+#   the VNA is configured once (setup_sweep), each step only sets the external parameter (set_outer callback)
+#       and the power, then triggers a sweep, the unchanged settings are not sent again
+#   the complex traces fill the preallocated array S[n_outer, n_points] in place
+#   while the VNA sweeps, the previous trace is appended to the checkpoint and published,
+#       so the rate of the sweep is set by the VNA and not by the saving or plotting
+#   the published data is |S| in dB downsampled to max_points frequencies, the full traces are in S and on disk
+#   steps are ordered outer value (slow) x power (fast)
+#
+# example:
+#   sweep = VNASweep(gw.vna, f_range=[4, 8], npoints=1601, navg=10, powers=np.linspace(-70, -20, 51))
+#   with DataSource('vna') as data:
+#       dataset = sweep.run(data, checkpoint_file=generate_checkpoint_name(params, 'vna_power'))
+def downsample_db(trace, max_points):
+    # |trace| in dB, reduced to at most max_points by keeping the minimum of each block of points,
+    #   so that narrow resonances (dips) stay visible
+    with np.errstate(divide='ignore'):
+        db = 20*np.log10(np.abs(trace))
+    return block_reduce(db, max_points, np.nanmin)
+
+def block_reduce(arr, max_points, func=np.nanmean):
+    # reduce a 1d array to at most max_points by applying func to blocks of neighbouring points
+    factor = int(np.ceil(len(arr)/max_points))
+    if factor <= 1:
+        return np.asarray(arr, dtype=np.float64)
+    pad = (-len(arr)) % factor
+    blocks = np.append(np.asarray(arr, dtype=np.float64), np.full(pad, np.nan)).reshape(-1, factor)
+    return func(blocks, axis=1)
+
+class VNASweep():
+
+    def __init__(self, vna, f_range, npoints=1601, navg=1, BW=1e3, Spar='S21', powers=(-50,),
+                 outer=(None,), set_outer=None, outer_pause=0, outer_label='outer', power_port2=False):
+        # vna: e5071c.E5071C, or the same driver through an InstrumentGateway
+        # f_range: [f_start, f_stop] in GHz
+        # powers: VNA powers (dBm) of each step
+        # outer: values of the external parameter, set_outer(outer_idx, outer_val) is called when it changes
+        # outer_pause: wait (s) after each set_outer, e.g. for a flux bias to settle
+        self.vna = vna
+        self.f_range = f_range
+        self.npoints = npoints
+        self.navg = navg
+        self.BW = BW
+        self.Spar = Spar
+        self.powers = np.atleast_1d(np.asarray(powers, dtype=np.float64))
+        self.outer = list(outer)
+        self.set_outer = set_outer
+        self.outer_pause = outer_pause
+        self.outer_label = outer_label
+        self.power_port2 = power_port2
+        self.print_progress = True
+
+        self.steps = [(outer_idx, power_idx) for outer_idx in range(len(self.outer)) for power_idx in range(len(self.powers))]
+        self.f = None
+        self.S = np.full((len(self.steps), npoints), np.nan, dtype=np.complex128)
+        self.done = 0
+
+    def step_values(self):
+        # value of each step for the y axis of plots: outer values, powers, or the step index if both are swept
+        if len(self.powers) == 1 and self.set_outer is not None:
+            return np.asarray(self.outer, dtype=np.float64)
+        if len(self.outer) == 1:
+            return self.powers
+        return np.arange(len(self.steps), dtype=np.float64)
+
+    def run(self, data=None, checkpoint_file=None, max_points=1000, max_rate=20):
+        # data: optional DataSource to publish to
+        # checkpoint_file: optional path ('.ckpt' or '.h5'), each trace is appended to the 'S' stream
+        vna = self.vna
+        y = self.step_values()
+        if len(self.powers) == 1 and self.set_outer is not None:
+            y_label = self.outer_label
+        elif len(self.outer) == 1:
+            y_label = 'power (dBm)'
+        else:
+            y_label = 'step'
+
+        print('initializing vna sweep...')
+        vna.setup_sweep(self.f_range, npoints=self.npoints, navg=self.navg, power=self.powers[0],
+                        Spar=self.Spar, BW=self.BW, power_port2=self.power_port2)
+        checkpoint = None
+        try:
+            self.f = np.asarray(vna.freq_read(), dtype=np.float64)
+
+            x = block_reduce(self.f/1e9, max_points)
+            z_db_arr = np.full((len(self.steps), len(x)), np.nan)
+            dataset = {
+                'x':x,
+                'y':y,
+                'z_db_arr':z_db_arr,   # one row per step, (y, x) orientation
+                'y_idx':-1,
+                'x_label':'frequency (GHz)',
+                'y_label':y_label,
+                'z_label':'|' + self.Spar + '| (dB)',
+                }
+
+            publisher = None
+            if data is not None:
+                publisher = DataPublisher(data, max_rate=max_rate)
+                publisher.flush(dataset)
+
+            if checkpoint_file is not None:
+                print('checkpointing to: ' + str(checkpoint_file))
+                checkpoint = open_checkpoint(checkpoint_file)
+                checkpoint.write_array('f', self.f)
+                checkpoint.write_array('powers', self.powers)
+                if self.set_outer is not None:
+                    checkpoint.write_array('outer', np.asarray(self.outer, dtype=np.float64))
+                checkpoint.create_stream('S', (self.npoints,), dtype=np.complex128)
+                checkpoint.set_state(Spar=self.Spar, navg=self.navg, BW=self.BW, outer_label=self.outer_label, y_idx=-1)
+
+            def finish_step(step_idx):
+                # save and publish a trace, runs while the VNA does the next sweep
+                z_db_arr[step_idx] = downsample_db(self.S[step_idx], max_points)
+                dataset['y_idx'] = step_idx
+                if checkpoint is not None:
+                    checkpoint.append('S', self.S[step_idx])
+                    checkpoint.set_state(y_idx=step_idx)
+                if publisher is not None:
+                    publisher.push(dataset, {'z_db_arr': step_idx})
+                self.done = step_idx + 1
+
+            print('sweeping...')
+            sweep_start_time = time.time()
+            current = (None, None)
+            previous = None
+            for step_idx, (outer_idx, power_idx) in enumerate(self.steps):
+                if outer_idx != current[0] and self.set_outer is not None:
+                    self.set_outer(outer_idx, self.outer[outer_idx])
+                    time.sleep(self.outer_pause)
+                if power_idx != current[1]:
+                    vna.power(self.powers[power_idx])
+                current = (outer_idx, power_idx)
+
+                vna.start_sweep()
+                if previous is not None:
+                    finish_step(previous)
+                vna.wait_sweep(self.navg)
+                self.S[step_idx] = np.asarray(vna.trace_read_complex(1))
+                previous = step_idx
+
+                if self.print_progress:
+                    this_time = round(time.time() - sweep_start_time,3)
+                    print('completed step ' + str(step_idx+1) + ' out of ' + str(len(self.steps)) + ', ' + str(this_time) + ' s')
+
+            if previous is not None:
+                finish_step(previous)
+
+            # make sure the last trace is published
+            if publisher is not None:
+                publisher.flush(dataset)
+
+            print('sweep finished, total sweep time is: ' + str(round(time.time() - sweep_start_time,3)) + ' s')
+        finally:
+            vna.end_sweep()
+            if checkpoint is not None:
+                checkpoint.close()
+
+        dataset['f'] = self.f
+        dataset['powers'] = self.powers
+        dataset['S'] = self.S
+        if self.set_outer is not None:
+            dataset['outer'] = np.asarray(self.outer, dtype=np.float64)
+        return dataset
@@ -11,6 +11,12 @@ from functools import partial
 import pyqtgraph as pg
 from colors_matplotlib import colors
 
+import sys
+import params
+path_name = params.PATH_PARAMS['nspyre_path']
+sys.path.insert(0,r'{}\Utility\Sweeps'.format(path_name))
+from data_publisher import DataReassembler
+
 class GUISweep(QWidget):
     def __init__(self):
         super().__init__()
@@ -49,6 +55,19 @@ class GUISweep(QWidget):
     def stop(self):
         self.sweep_proc.kill()
 
+class DeltaDataSink(DataSink):
+    # DataSink for sweeps published with a DataPublisher, rebuilds the full dataset from the delta pushes
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reassembler = DataReassembler()
+
+    def pop(self, *args, **kwargs):
+        super().pop(*args, **kwargs)
+        updated = self.reassembler.apply(self.data)
+        if self.reassembler.dataset is not None:
+            self.data = self.reassembler.dataset
+        return updated
+
 class GUIPlot1D_2Ch(LinePlotWidget):
     def __init__(self):
         super().__init__()
@@ -125,7 +144,7 @@ class GUIPlot1D_2Ch(LinePlotWidget):
                 symbolPen=(colors['C1'][0], colors['C1'][1], colors['C1'][2], 100),
                 )
 
-        self.sink = DataSink(params.ALL['data'])
+        self.sink = DeltaDataSink(params.ALL['data'])
 
         self.plot_widget.setBackground('w')
         self.plot_widget.setLabel('left',params.ALL['z_label'])
@@ -196,7 +215,7 @@ class GUIPlot1D(LinePlotWidget):
                 symbolPen=(colors['C0'][0], colors['C0'][1], colors['C0'][2], 100),
                 )
 
-        self.sink = DataSink(params.ALL['data'])
+        self.sink = DeltaDataSink(params.ALL['data'])
 
         self.plot_widget.setBackground('w')
         self.plot_widget.setLabel('left',params.ALL['z_label'])
@@ -282,7 +282,8 @@ class LinePlotWidget(QWidget):
             # notify that new data is available
             self.new_data.emit(name)
 
-    def set_data(self, name:str, xdata, ydata):
+    def set_data(self, name:str, xdata, ydata, error=None):
+        """Set the data of a line plot, with optional error bars of +/- error (e.g. the standard error of the mean)."""
         if name not in self.plots:
             raise ValueError(f'A plot with the name {name} does not exist.')
 
@@ -291,6 +292,7 @@ class LinePlotWidget(QWidget):
         # set the new x and y data
         self.plots[name]['x'] = xdata
         self.plots[name]['y'] = ydata
+        self.plots[name]['error'] = error
 
         # notify the watcher
         try:
@@ -309,6 +311,17 @@ class LinePlotWidget(QWidget):
                 self.plots[name]['x'],
                 self.plots[name]['y'],
             )
+            error = self.plots[name].get('error')
+            if error is not None:
+                # error bars are created the first time error data is set
+                if 'error_bars' not in self.plots[name]:
+                    self.plots[name]['error_bars'] = pg.ErrorBarItem(pen=self.plots[name]['plot'].opts['pen'])
+                    self.plot_widget.addItem(self.plots[name]['error_bars'])
+                self.plots[name]['error_bars'].setData(
+                    x=np.asarray(self.plots[name]['x']),
+                    y=np.asarray(self.plots[name]['y']),
+                    height=2*np.asarray(error),
+                )
            #  self.plots[name]['plot'].setLabel(
            #      axis = 'bottom',
            #      text = self.plots[name]['x_label'],